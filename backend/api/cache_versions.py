@@ -0,0 +1,31 @@
+from time import time_ns
+
+from django.core.cache import cache
+
+
+def get_version(key):
+    # Отсутствующая версия заводится от текущего времени, а не с 1:
+    # после вытеснения ключа номера не повторяются и старые записи
+    # кеша под ними не оживают.
+    version = cache.get(key)
+    if version is None:
+        version = time_ns()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def get_versions(keys):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = get_version(key)
+    return versions
+
+
+def bump_version(*keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time_ns(), timeout=None)
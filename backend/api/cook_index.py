@@ -0,0 +1,149 @@
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from itertools import chain
+
+from django.core.cache import cache
+
+from recipes.models import RecipeIng
+from .cache_versions import bump_version, get_version
+
+VERSION_KEY = 'cook_index_version'
+CHANGES_KEY = 'cook_index_changes:{version}'
+CHANGES_TIMEOUT = 24 * 60 * 60
+# При большем отставании индекс дешевле перестроить целиком.
+MAX_CHANGES_LAG = 100
+
+
+class CookIndex:
+    # Инвертированный индекс «ингредиент -> отсортированный массив id
+    # рецептов» и число ингредиентов каждого рецепта. Изменённые рецепты
+    # публикуются в общем кеше под номером версии, и каждый процесс
+    # догружает их из базы вместо полной перестройки.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        # Поиск читает пару (postings, sizes) одним обращением, а
+        # изменения собирают новые массивы и подменяют пару целиком:
+        # параллельный поиск не видит рецепт удалённым наполовину.
+        self._data = ({}, array('H'))
+
+    @staticmethod
+    def _set_size(sizes, recipe_id, size):
+        if recipe_id >= len(sizes):
+            sizes.extend([0] * (recipe_id + 1 - len(sizes)))
+        sizes[recipe_id] = size
+
+    def _build(self):
+        postings = defaultdict(lambda: array('I'))
+        sizes = array('H')
+        rows = RecipeIng.objects.order_by(
+            'ingredient_id', 'recipe_id'
+        ).values_list('ingredient_id', 'recipe_id').iterator()
+        counts = Counter()
+        for ingredient_id, recipe_id in rows:
+            postings[ingredient_id].append(recipe_id)
+            counts[recipe_id] += 1
+        for recipe_id, size in counts.items():
+            self._set_size(sizes, recipe_id, size)
+        self._data = (dict(postings), sizes)
+
+    def _apply_changes(self, recipe_ids):
+        old_postings, old_sizes = self._data
+        postings = {}
+        for ingredient_id, posting in old_postings.items():
+            if any(
+                self._contains(posting, recipe_id) for recipe_id in recipe_ids
+            ):
+                posting = array('I', (
+                    recipe_id for recipe_id in posting
+                    if recipe_id not in recipe_ids
+                ))
+            if posting:
+                postings[ingredient_id] = posting
+        copied = set()
+        counts = Counter()
+        for ingredient_id, recipe_id in RecipeIng.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('ingredient_id', 'recipe_id'):
+            if ingredient_id not in copied:
+                postings[ingredient_id] = array(
+                    'I', postings.get(ingredient_id, ())
+                )
+                copied.add(ingredient_id)
+            insort(postings[ingredient_id], recipe_id)
+            counts[recipe_id] += 1
+        sizes = array('H', old_sizes)
+        for recipe_id in recipe_ids:
+            self._set_size(sizes, recipe_id, counts[recipe_id])
+        self._data = (postings, sizes)
+
+    @staticmethod
+    def _contains(posting, recipe_id):
+        position = bisect_left(posting, recipe_id)
+        return position < len(posting) and posting[position] == recipe_id
+
+    def _get_changes(self, version):
+        if self._version is None or version - self._version > MAX_CHANGES_LAG:
+            return None
+        keys = [
+            CHANGES_KEY.format(version=number)
+            for number in range(self._version + 1, version + 1)
+        ]
+        changes = cache.get_many(keys)
+        if len(changes) != len(keys):
+            return None
+        return set(chain.from_iterable(changes.values()))
+
+    def _refresh(self):
+        version = get_version(VERSION_KEY)
+        if self._version == version:
+            return
+        with self._lock:
+            if self._version == version:
+                return
+            changes = self._get_changes(version)
+            if changes is None:
+                self._build()
+            else:
+                self._apply_changes(changes)
+            self._version = version
+
+    def search(self, ingredient_ids, max_missing=None):
+        # Возвращает (id рецепта, недостающих ингредиентов, совпавших)
+        # по возрастанию недостающих.
+        self._refresh()
+        postings, sizes = self._data
+        coverage = Counter()
+        for ingredient_id in set(ingredient_ids):
+            coverage.update(postings.get(ingredient_id, ()))
+        results = []
+        for recipe_id, matched in coverage.items():
+            missing = sizes[recipe_id] - matched
+            if max_missing is None or missing <= max_missing:
+                results.append((recipe_id, missing, matched))
+        results.sort(key=lambda row: (row[1], -row[2], -row[0]))
+        return results
+
+    @staticmethod
+    def update_recipes(*recipe_ids):
+        # Номер версии берётся из incr, чтобы параллельные изменения
+        # не записали список в один и тот же ключ.
+        try:
+            version = cache.incr(VERSION_KEY)
+        except ValueError:
+            # Версии нет в кеше: процессы всё равно перестроят индекс.
+            bump_version(VERSION_KEY)
+            return
+        cache.set(
+            CHANGES_KEY.format(version=version), recipe_ids, CHANGES_TIMEOUT
+        )
+
+    @staticmethod
+    def invalidate():
+        bump_version(VERSION_KEY)
+
+
+cook_index = CookIndex()
@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Sub
+
+User = get_user_model()
+
+# Денормализованный счётчик: модель, поле, связанная модель и её FK.
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribers_count', Sub, 'subscribed_to'),
+)
+RECIPE_COUNTERS = {Favorite: 'favorites_count', ShoppingCart: 'in_carts_count'}
+
+
+def change_counter(queryset, field, delta):
+    queryset.update(**{field: Greatest(F(field) + delta, Value(0))})
+
+
+def count_related(related_model, related_field):
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(**{related_field: OuterRef('pk')})
+            .order_by()
+            .values(related_field)
+            .annotate(count=Count('pk'))
+            .values('count')
+        ),
+        0,
+    )
+
+
+def change_recipe_counter(relation_model, recipe_id, delta):
+    change_counter(
+        Recipe.objects.filter(pk=recipe_id),
+        RECIPE_COUNTERS[relation_model],
+        delta,
+    )
+
+
+def refresh_recipe_counter(relation_model, recipe_ids):
+    # Для пакетных операций: счётчики затронутых рецептов пересчитываются
+    # по фактическому числу строк одним UPDATE.
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        **{
+            RECIPE_COUNTERS[relation_model]: count_related(
+                relation_model, 'recipe'
+            )
+        }
+    )
+
+
+def change_subscribers_counter(author_id, delta):
+    change_counter(
+        User.objects.filter(pk=author_id), 'subscribers_count', delta
+    )
+
+
+def change_recipes_counter(author_id, delta):
+    change_counter(User.objects.filter(pk=author_id), 'recipes_count', delta)
@@ -0,0 +1,107 @@
+from heapq import merge
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from recipes.models import FeedEntry, Recipe
+from users.models import Sub
+
+User = get_user_model()
+
+
+def is_fanout_author(author):
+    # Рецепты авторов с огромным числом подписчиков не раскладываются
+    # по лентам, а подмешиваются при чтении.
+    return author.subscribers_count <= settings.FEED_FANOUT_LIMIT
+
+
+def fan_out_recipe(recipe):
+    # Число подписчиков перечитывается в том же запросе: объект автора
+    # мог устареть. Ленты получателей сразу обрезаются до
+    # FEED_TIMELINE_SIZE, чтобы не расти без ограничений.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            INSERT INTO {FeedEntry._meta.db_table} (user_id, recipe_id)
+            SELECT sub.user_id, %s FROM {Sub._meta.db_table} AS sub
+            JOIN {User._meta.db_table} AS author
+            ON author.id = sub.subscribed_to_id
+            WHERE sub.subscribed_to_id = %s
+            AND author.subscribers_count <= %s
+            ON CONFLICT DO NOTHING
+            RETURNING user_id
+            ''',
+            (recipe.id, recipe.author_id, settings.FEED_FANOUT_LIMIT),
+        )
+        user_ids = [row[0] for row in cursor.fetchall()]
+    trim_feeds(user_ids)
+
+
+def add_author_to_feed(user, author):
+    if not is_fanout_author(author):
+        return
+    recipe_ids = Recipe.objects.filter(author=author).order_by(
+        '-id'
+    ).values_list('id', flat=True)[:settings.FEED_TIMELINE_SIZE]
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user=user, recipe_id=recipe_id)
+         for recipe_id in recipe_ids),
+        ignore_conflicts=True,
+    )
+
+
+def remove_author_from_feed(user, author):
+    FeedEntry.objects.filter(user=user, recipe__author=author).delete()
+
+
+def get_feed_recipe_ids(user, before=None, limit=None):
+    # Лента ограничена FEED_TIMELINE_SIZE последними рецептами; раздача
+    # по лентам сливается с рецептами авторов без раскладки.
+    limit = limit or settings.FEED_TIMELINE_SIZE
+    timeline = FeedEntry.objects.filter(user=user).order_by('-recipe_id')
+    pulled = Recipe.objects.filter(
+        author__in=user.subscriptions.filter(
+            subscribed_to__subscribers_count__gt=settings.FEED_FANOUT_LIMIT
+        ).values('subscribed_to')
+    ).order_by('-id')
+    if before is not None:
+        timeline = timeline.filter(recipe_id__lt=before)
+        pulled = pulled.filter(id__lt=before)
+    streams = (
+        timeline.values_list('recipe_id', flat=True)[:limit],
+        pulled.values_list('id', flat=True)[:limit],
+    )
+    recipe_ids = []
+    for recipe_id in merge(*map(list, streams), reverse=True):
+        if not recipe_ids or recipe_ids[-1] != recipe_id:
+            recipe_ids.append(recipe_id)
+    return recipe_ids[:limit]
+
+
+def trim_feeds(user_ids):
+    # Удаляет из лент всё, что старше FEED_TIMELINE_SIZE последних записей.
+    # Граница ищется для каждой ленты по индексу (user, recipe), поэтому
+    # стоимость не зависит от длины лент.
+    if not user_ids:
+        return 0
+    table = FeedEntry._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            DELETE FROM {table} AS entry
+            USING (
+                SELECT feed.user_id, (
+                    SELECT recipe_id FROM {table}
+                    WHERE user_id = feed.user_id
+                    ORDER BY recipe_id DESC
+                    OFFSET %s LIMIT 1
+                ) AS boundary
+                FROM unnest(%s) AS feed(user_id)
+            ) AS feed
+            WHERE entry.user_id = feed.user_id
+            AND entry.recipe_id <= feed.boundary
+            ''',
+            (settings.FEED_TIMELINE_SIZE, list(user_ids)),
+        )
+        return cursor.rowcount
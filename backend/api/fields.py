@@ -0,0 +1,126 @@
+from pathlib import Path
+from uuid import uuid4
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+
+class ImageField(Base64ImageField):
+    # Принимает и base64-строку из JSON, и файл из multipart/form-data;
+    # крупный файл Django сохраняет во временный файл на диске.
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            data.name = f'{uuid4()}{Path(data.name).suffix.lower()}'
+            return serializers.ImageField.to_internal_value(self, data)
+        return super().to_internal_value(data)
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        variants = {}
+        for variant, name in value.items():
+            if variant == 'source':
+                continue
+            url = default_storage.url(name)
+            variants[variant] = (
+                request.build_absolute_uri(url) if request else url
+            )
+        return variants
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    # Разрешает список первичных ключей одним запросом id__in.
+    # Внутри BulkRelatedListSerializer возвращает сам ключ, а объекты
+    # подставляет список целиком.
+    default_error_messages = {
+        'does_not_exist_many': (
+            'Объекты с первичными ключами {pk_values} не существуют.'
+        ),
+    }
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    @property
+    def is_deferred(self):
+        return isinstance(
+            getattr(self.parent, 'parent', None), BulkRelatedListSerializer
+        )
+
+    def to_pk(self, data):
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        try:
+            if isinstance(data, bool):
+                raise TypeError
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+    def to_internal_value(self, data):
+        if self.is_deferred:
+            return self.to_pk(data)
+        return self.to_internal_value_many([data])[0]
+
+    def to_internal_value_many(self, data):
+        pks = [self.to_pk(item) for item in data]
+        objects = self.get_queryset().in_bulk(set(pks))
+        missing = [pk for pk in dict.fromkeys(pks) if pk not in objects]
+        if missing:
+            self.fail(
+                'does_not_exist_many',
+                pk_values=', '.join(str(pk) for pk in missing),
+            )
+        return [objects[pk] for pk in pks]
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        return self.child_relation.to_internal_value_many(data)
+
+
+class BulkRelatedListSerializer(serializers.ListSerializer):
+    # Вложенные BulkPrimaryKeyRelatedField всех элементов списка
+    # разрешаются одним запросом на поле.
+
+    def to_internal_value(self, data):
+        validated = super().to_internal_value(data)
+        for field in self.child.fields.values():
+            if field.read_only or not isinstance(
+                field, BulkPrimaryKeyRelatedField
+            ):
+                continue
+            *path, attr = field.source_attrs
+            containers = []
+            for item in validated:
+                for key in path:
+                    item = item[key]
+                containers.append(item)
+            try:
+                objects = field.to_internal_value_many(
+                    [container[attr] for container in containers]
+                )
+            except serializers.ValidationError as exc:
+                raise serializers.ValidationError(
+                    {field.field_name: exc.detail}
+                )
+            for container, obj in zip(containers, objects):
+                container[attr] = obj
+        return validated
@@ -1,16 +1,20 @@
+from django.db.models.functions import Lower
 from django_filters import rest_framework as df_filters
 
 from recipes.models import Ingredient
 
 
 class IngFilter(df_filters.FilterSet):
-    name = df_filters.CharFilter(
-        field_name='name',
-        lookup_expr='istartswith'
-    )
+    name = df_filters.CharFilter(method='filter_name')
 
     class Meta:
         model = Ingredient
         fields = (
             'name',
         )
+
+    def filter_name(self, queryset, name, value):
+        # LOWER(name) LIKE 'x%' использует индекс ingredient_name_prefix_idx.
+        return queryset.annotate(
+            name_lower=Lower('name')
+        ).filter(name_lower__startswith=value.lower())
@@ -0,0 +1,142 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PROCESSING_WORKERS,
+            thread_name_prefix='image-processing',
+        )
+    return _executor
+
+
+def get_variant_name(name, variant):
+    path = PurePosixPath(name)
+    extension = settings.IMAGE_VARIANT_FORMAT.lower()
+    return str(path.parent / 'variants' / f'{path.stem}_{variant}.{extension}')
+
+
+def render_variants(image_file):
+    image_format = settings.IMAGE_VARIANT_FORMAT
+    with Image.open(image_file) as source:
+        source.load()
+        source = ImageOps.exif_transpose(source)
+        mode = 'RGB' if image_format == 'JPEG' else 'RGBA'
+        if source.mode != mode:
+            source = source.convert(mode)
+        for variant, size in settings.IMAGE_VARIANT_SIZES.items():
+            image = source.copy()
+            image.thumbnail(size)
+            buffer = BytesIO()
+            image.save(
+                buffer,
+                format=image_format,
+                quality=settings.IMAGE_VARIANT_QUALITY,
+            )
+            yield variant, buffer.getvalue()
+
+
+def delete_variant_files(storage, variants):
+    for variant, name in variants.items():
+        if variant != 'source':
+            storage.delete(name)
+
+
+def delete_image_variants(instance, field_name):
+    # django-cleanup удаляет только файлы полей модели, варианты из JSON
+    # удаляются отдельно после фиксации транзакции.
+    variants = getattr(instance, f'{field_name}_variants')
+    if variants:
+        transaction.on_commit(partial(
+            delete_variant_files,
+            getattr(instance, field_name).storage,
+            variants,
+        ))
+
+
+def process_image(model_label, pk, field_name):
+    model = apps.get_model(model_label)
+    variants_field = f'{field_name}_variants'
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return
+    image = getattr(instance, field_name)
+    old_variants = getattr(instance, variants_field)
+    if not image or old_variants.get('source') == image.name:
+        return
+
+    variants = {'source': image.name}
+    with image.open('rb') as image_file:
+        for variant, content in render_variants(image_file):
+            variants[variant] = image.storage.save(
+                get_variant_name(image.name, variant), ContentFile(content)
+            )
+
+    current = model.objects.filter(pk=pk).values_list(
+        field_name, flat=True
+    ).first()
+    stale = old_variants if current == image.name else variants
+    delete_variant_files(image.storage, stale)
+    if current != image.name:
+        return
+
+    setattr(instance, variants_field, variants)
+    instance.save(update_fields=(variants_field,))
+
+
+def _run_safely(task):
+    try:
+        task()
+    except Exception:
+        logger.exception('Не удалось обработать изображение')
+
+
+def _run_in_worker(task):
+    try:
+        _run_safely(task)
+    finally:
+        connections.close_all()
+
+
+def clear_image_variants(instance, field_name):
+    variants_field = f'{field_name}_variants'
+    delete_image_variants(instance, field_name)
+    instance._meta.model._default_manager.filter(pk=instance.pk).update(
+        **{variants_field: {}}
+    )
+    setattr(instance, variants_field, {})
+
+
+def enqueue_image_processing(instance, field_name):
+    image = getattr(instance, field_name)
+    variants = getattr(instance, f'{field_name}_variants')
+    if not image:
+        if variants:
+            clear_image_variants(instance, field_name)
+        return
+    if variants.get('source') == image.name:
+        return
+    task = partial(
+        process_image, instance._meta.label, instance.pk, field_name
+    )
+    if settings.IMAGE_PROCESSING_SYNC:
+        transaction.on_commit(partial(_run_safely, task))
+    else:
+        transaction.on_commit(
+            lambda: get_executor().submit(_run_in_worker, task)
+        )
@@ -0,0 +1,56 @@
+import threading
+from bisect import bisect_left
+
+from recipes.models import Ingredient
+from .cache_versions import bump_version, get_version
+
+VERSION_KEY = 'ingredient_index_version'
+
+
+class IngredientIndex:
+    # Версия хранится в общем кеше, чтобы изменения ингредиентов
+    # в одном процессе перестраивали индекс и в остальных.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = ((), ())
+
+    def _build(self):
+        rows = sorted(
+            (name.lower(), pk, name, unit)
+            for pk, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            ).iterator()
+        )
+        keys = tuple(row[0] for row in rows)
+        items = tuple(
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for _, pk, name, unit in rows
+        )
+        return keys, items
+
+    def _get_data(self):
+        version = get_version(VERSION_KEY)
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    self._data = self._build()
+                    self._version = version
+        return self._data
+
+    def search(self, prefix, limit=None):
+        keys, items = self._get_data()
+        prefix = prefix.lower()
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + chr(0x10FFFF), lo=start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return list(items[start:end])
+
+    @staticmethod
+    def invalidate():
+        bump_version(VERSION_KEY)
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,143 @@
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from api.feed import add_author_to_feed, fan_out_recipe, get_feed_recipe_ids
+from api.paginations import Pagination
+from recipes.models import Recipe
+from users.models import Sub
+
+User = get_user_model()
+
+BENCH_PREFIX = 'bench_feed_'
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеры ленты подписок: раскладка рецепта по лентам, чтение ленты '
+        'и наивный запрос по подпискам (данные откатываются)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--followers', type=int, default=100_000)
+        parser.add_argument('--authors', type=int, default=200)
+        parser.add_argument('--recipes-per-author', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def _create_users(self, prefix, count):
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f'{BENCH_PREFIX}{prefix}{number}',
+                    email=f'{BENCH_PREFIX}{prefix}{number}@example.com',
+                    first_name='Bench',
+                    last_name='User',
+                    password='!',
+                )
+                for number in range(count)
+            ),
+            batch_size=5000,
+        )
+        return User.objects.filter(
+            username__startswith=f'{BENCH_PREFIX}{prefix}'
+        )
+
+    def _measure(self, title, action, repeat):
+        started = perf_counter()
+        for _ in range(repeat):
+            action()
+        self.stdout.write(
+            f'{title}: {(perf_counter() - started) * 1000 / repeat:.2f} мс'
+        )
+
+    def _create_recipe(self, author, number):
+        return Recipe.objects.bulk_create((Recipe(
+            author=author,
+            name=f'{BENCH_PREFIX}{number}',
+            text='Описание',
+            image='recipes/images/bench.png',
+            cooking_time=1,
+        ),))[0]
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        limit = Pagination.page_size
+        with transaction.atomic():
+            # Читатель подписан на authors авторов с готовыми лентами.
+            reader = self._create_users('reader', 1).get()
+            authors = list(self._create_users('author', options['authors']))
+            Recipe.objects.bulk_create(
+                (
+                    Recipe(
+                        author=author,
+                        name=f'{BENCH_PREFIX}{author.id}_{number}',
+                        text='Описание',
+                        image='recipes/images/bench.png',
+                        cooking_time=1,
+                    )
+                    for author in authors
+                    for number in range(options['recipes_per_author'])
+                ),
+                batch_size=5000,
+            )
+            Sub.objects.bulk_create(
+                Sub(user=reader, subscribed_to=author) for author in authors
+            )
+            for author in authors:
+                add_author_to_feed(reader, author)
+
+            # Популярный автор с followers подписчиками.
+            star = self._create_users('star', 1).get()
+            followers = self._create_users('follower', options['followers'])
+            Sub.objects.bulk_create(
+                (
+                    Sub(user_id=follower_id, subscribed_to=star)
+                    for follower_id in followers.values_list('id', flat=True)
+                ),
+                batch_size=5000,
+            )
+            User.objects.filter(pk=star.pk).update(
+                subscribers_count=options['followers']
+            )
+            star.refresh_from_db()
+            Sub.objects.create(user=reader, subscribed_to=star)
+
+            numbers = iter(range(repeat * 2))
+            with override_settings(FEED_FANOUT_LIMIT=options['followers']):
+                self._measure(
+                    f'Раскладка рецепта {options["followers"]} подписчикам',
+                    lambda: fan_out_recipe(
+                        self._create_recipe(star, next(numbers))
+                    ),
+                    repeat,
+                )
+            # Дальше автор считается популярным: рецепты подмешиваются
+            # при чтении.
+            with override_settings(
+                FEED_FANOUT_LIMIT=options['followers'] - 1
+            ):
+                self._measure(
+                    'Публикация без раскладки (гибридный режим)',
+                    lambda: fan_out_recipe(
+                        self._create_recipe(star, next(numbers))
+                    ),
+                    repeat,
+                )
+                self._measure(
+                    'Чтение ленты (лента + подмешивание)',
+                    lambda: list(Recipe.objects.filter(
+                        id__in=get_feed_recipe_ids(reader, limit=limit)
+                    )),
+                    repeat,
+                )
+            self._measure(
+                'Наивный запрос по подпискам',
+                lambda: list(Recipe.objects.filter(
+                    author__subscribers__user=reader
+                ).order_by('-id')[:limit]),
+                repeat,
+            )
+            transaction.set_rollback(True)
@@ -0,0 +1,110 @@
+import base64
+import json
+import os
+import resource
+import subprocess
+import sys
+from io import BytesIO
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import transaction
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+PATHS = ('json', 'multipart')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение загрузки изображения рецепта: base64 в JSON '
+        'и multipart/form-data (пиковый RSS и время ответа)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=(10, 20))
+        parser.add_argument('--path', choices=PATHS)
+        parser.add_argument('--size', type=int)
+
+    def handle(self, *args, **options):
+        if options['path']:
+            return self._run(options['path'], options['size'])
+        # Каждый замер в отдельном процессе: ru_maxrss только растёт.
+        for size in options['sizes']:
+            for path in PATHS:
+                output = subprocess.run(
+                    (
+                        sys.executable, sys.argv[0], 'bench_image_upload',
+                        '--path', path, '--size', str(size),
+                    ),
+                    capture_output=True, check=True, text=True,
+                ).stdout
+                latency, rss_growth = json.loads(output)
+                self.stdout.write(
+                    f'{size} МБ, {path}: {latency:.0f} мс, '
+                    f'прирост RSS {rss_growth / 1024:.1f} МБ'
+                )
+
+    @staticmethod
+    def _make_image(size):
+        # Шум в PNG почти не сжимается: 3 байта на пиксель.
+        side = int((size * 1024 * 1024 / 3) ** 0.5)
+        image = Image.frombytes('RGB', (side, side), os.urandom(side ** 2 * 3))
+        buffer = BytesIO()
+        image.save(buffer, 'PNG', compress_level=1)
+        buffer.seek(0)
+        buffer.name = 'bench.png'
+        return buffer
+
+    @staticmethod
+    def _get_rss():
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def _run(self, path, size):
+        image = self._make_image(size)
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username='bench_upload', email='bench_upload@example.com',
+                password='bench_upload', first_name='bench',
+                last_name='bench',
+            )
+            tag = Tag.objects.create(name='bench_upload', slug='bench_upload')
+            ingredient = Ingredient.objects.create(
+                name='bench_upload', measurement_unit='г'
+            )
+            client = APIClient()
+            client.force_authenticate(user)
+            data = {
+                'name': 'bench_upload',
+                'text': 'bench_upload',
+                'cooking_time': 1,
+                'tags': [tag.id],
+                'ingredients': [{'id': ingredient.id, 'amount': 1}],
+            }
+            if path == 'json':
+                encoded = base64.b64encode(image.getvalue()).decode()
+                data['image'] = f'data:image/png;base64,{encoded}'
+                del encoded
+                request = {'data': data, 'format': 'json'}
+            else:
+                data['ingredients'] = json.dumps(data['ingredients'])
+                data['image'] = image
+                request = {'data': data, 'format': 'multipart'}
+            rss = self._get_rss()
+            started = perf_counter()
+            response = client.post('/api/recipes/', **request)
+            latency = (perf_counter() - started) * 1000
+            rss_growth = self._get_rss() - rss
+            if response.status_code != 201:
+                self.stderr.write(str(response.data))
+            else:
+                Recipe.objects.get(
+                    id=response.data['id']
+                ).image.delete(save=False)
+            transaction.set_rollback(True)
+        self.stdout.write(json.dumps((latency, rss_growth)))
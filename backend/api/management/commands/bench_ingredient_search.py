@@ -0,0 +1,50 @@
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db.models.functions import Lower
+
+from api.filters import IngFilter
+from api.ingredient_index import ingredient_index
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = 'Сравнение поиска ингредиентов по префиксу: ORM и индекс в памяти'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=100)
+        parser.add_argument(
+            '--prefixes', nargs='+', default=('а', 'мо', 'сах', 'кар')
+        )
+
+    def _measure(self, search, prefixes, repeat):
+        started = perf_counter()
+        for _ in range(repeat):
+            for prefix in prefixes:
+                search(prefix)
+        return (perf_counter() - started) * 1000 / (repeat * len(prefixes))
+
+    def handle(self, *args, **options):
+        limit = settings.INGREDIENT_SEARCH_LIMIT
+        prefixes = options['prefixes']
+        repeat = options['repeat']
+
+        def orm_search(prefix):
+            queryset = IngFilter(
+                {'name': prefix},
+                queryset=Ingredient.objects.order_by(Lower('name')),
+            ).qs
+            return list(
+                queryset.values('id', 'name', 'measurement_unit')[:limit]
+            )
+
+        def index_search(prefix):
+            return ingredient_index.search(prefix, limit)
+
+        index_search(prefixes[0])
+        for name, search in (('ORM', orm_search), ('Индекс', index_search)):
+            self.stdout.write(
+                f'{name}: {self._measure(search, prefixes, repeat):.3f} мс '
+                'на запрос'
+            )
@@ -0,0 +1,65 @@
+from time import perf_counter
+
+from django.core.management import BaseCommand
+
+from api.similarity import (
+    get_affected_recipes,
+    get_top_similar,
+    load_matrix,
+    mark_similar_outdated,
+    store_similar,
+)
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт похожих рецептов по ингредиентам и тегам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Число строк произведения X @ X.T в памяти за раз',
+        )
+        parser.add_argument(
+            '--outdated',
+            action='store_true',
+            help='Пересчитать только рецепты с изменённым составом',
+        )
+
+    def _claim_recipes(self, outdated):
+        # Флаг снимается до чтения данных: изменения, сделанные во время
+        # пересчёта, снова пометят рецепт.
+        recipes = Recipe.objects.all()
+        if outdated:
+            recipes = recipes.filter(similar_outdated=True)
+        recipe_ids = list(recipes.values_list('id', flat=True))
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            similar_outdated=False
+        )
+        return recipe_ids
+
+    def handle(self, *args, **options):
+        started = perf_counter()
+        changed_ids = self._claim_recipes(options['outdated'])
+        try:
+            recipe_ids, matrix = load_matrix()
+            targets = recipe_ids.tolist()
+            if options['outdated']:
+                targets = sorted(
+                    get_affected_recipes(recipe_ids, matrix, changed_ids)
+                )
+            batch_size = options['batch_size']
+            for start in range(0, len(targets), batch_size):
+                store_similar(get_top_similar(
+                    recipe_ids, matrix, targets[start:start + batch_size]
+                ))
+        except Exception:
+            mark_similar_outdated(*changed_ids)
+            raise
+        self.stdout.write(
+            f'Изменённых рецептов: {len(changed_ids)}, '
+            f'пересчитано: {len(targets)}, '
+            f'{perf_counter() - started:.2f} с'
+        )
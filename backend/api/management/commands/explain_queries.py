@@ -0,0 +1,116 @@
+import re
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.db.models.functions import Lower
+
+from api.paginations import Pagination
+from api.recipes_filters import RECIPE_ORDERINGS, RecipeFilter
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+
+INDEX_SCAN = re.compile(
+    r'(?:Index Scan|Index Only Scan|Bitmap Index Scan) '
+    r'(?:Backward )?on (\w+)'
+)
+EXECUTION_TIME = re.compile(r'Execution Time: ([\d.]+) ms')
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN ANALYZE основных запросов поиска и фильтрации'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='сах')
+        parser.add_argument('--substring', default='кур')
+        parser.add_argument('--search', default='курица с картофелем')
+        parser.add_argument(
+            '--fail-on-seq-scan',
+            action='store_true',
+            help='Завершиться с ошибкой, если запрос не использует индекс',
+        )
+        parser.add_argument(
+            '--show-plans',
+            action='store_true',
+            help='Выводить планы запросов целиком',
+        )
+
+    def get_filter_queries(self, search):
+        page_size = Pagination.page_size
+        queries = {}
+        favorite = Favorite.objects.values('user_id').first()
+        if favorite:
+            queries['Рецепты: is_favorited'] = Recipe.objects.filter(
+                favorites__user=favorite['user_id']
+            )[:page_size]
+        cart = ShoppingCart.objects.values('user_id').first()
+        if cart:
+            queries['Рецепты: is_in_shopping_cart'] = Recipe.objects.filter(
+                shopping_carts__user=cart['user_id']
+            )[:page_size]
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        if tags:
+            queries['Рецепты: tags'] = Recipe.objects.filter(
+                tags__slug__in=tags
+            ).distinct()[:page_size]
+        queries['Рецепты: search'] = RecipeFilter(
+            {'search': search}, queryset=Recipe.objects.all()
+        ).qs[:page_size]
+        for ordering in RECIPE_ORDERINGS:
+            queries[f'Рецепты: ordering={ordering}'] = RecipeFilter(
+                {'ordering': ordering}, queryset=Recipe.objects.all()
+            ).qs[:page_size]
+        recipe = Recipe.objects.values('author_id').first()
+        if recipe:
+            queries['Рецепты: author'] = Recipe.objects.filter(
+                author=recipe['author_id']
+            )[:page_size]
+        return queries
+
+    def get_queries(self, prefix, substring):
+        return {
+            'Ингредиенты: поиск по префиксу': Ingredient.objects.annotate(
+                name_lower=Lower('name')
+            ).filter(name_lower__startswith=prefix.lower()),
+            'Ингредиенты: сортировка по Lower(name)': (
+                Ingredient.objects.order_by(Lower('name'))[:50]
+            ),
+            'Ингредиенты: поиск в админке': Ingredient.objects.filter(
+                name__icontains=substring
+            ),
+            'Рецепты: поиск по префиксу': Recipe.objects.annotate(
+                name_lower=Lower('name')
+            ).filter(name_lower__startswith=prefix.lower()),
+            'Рецепты: поиск в админке': Recipe.objects.filter(
+                name__icontains=substring
+            ),
+        }
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Команда поддерживает только PostgreSQL')
+
+        failed = []
+        queries = {
+            **self.get_queries(options['prefix'], options['substring']),
+            **self.get_filter_queries(options['search']),
+        }
+        for title, queryset in queries.items():
+            plan = queryset.explain(analyze=True)
+            indexes = sorted(set(INDEX_SCAN.findall(plan)))
+            time = EXECUTION_TIME.search(plan)
+            time = f' ({time.group(1)} мс)' if time else ''
+            if indexes:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{title}: индекс {", ".join(indexes)}{time}'
+                ))
+            else:
+                failed.append(title)
+                self.stdout.write(self.style.WARNING(
+                    f'{title}: последовательное чтение{time}'
+                ))
+            if options['show_plans']:
+                self.stdout.write(plan)
+
+        if failed and options['fail_on_seq_scan']:
+            raise CommandError(
+                f'Запросы без индекса: {", ".join(failed)}'
+            )
@@ -0,0 +1,65 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from api.counters import COUNTERS
+
+
+class Command(BaseCommand):
+    help = 'Сверка денормализованных счётчиков с фактическими данными'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, не исправляя их',
+        )
+
+    def _reconcile_batch(self, model, field, related_model, related_field,
+                         pks, dry_run):
+        with transaction.atomic():
+            # Строки блокируются до подсчёта: параллельные F()-обновления
+            # применятся уже поверх исправленного значения.
+            objects = list(
+                model.objects.filter(pk__in=pks)
+                .select_for_update()
+                .only('pk', field)
+            )
+            actual = dict(
+                related_model.objects.filter(**{f'{related_field}__in': pks})
+                .order_by()
+                .values_list(related_field)
+                .annotate(count=Count('pk'))
+            )
+            drifted = []
+            for obj in objects:
+                count = actual.get(obj.pk, 0)
+                if getattr(obj, field) != count:
+                    setattr(obj, field, count)
+                    drifted.append(obj)
+            if drifted and not dry_run:
+                model.objects.bulk_update(drifted, (field,))
+        return len(drifted)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model, field, related_model, related_field in COUNTERS:
+            last_pk = 0
+            drifted = 0
+            while True:
+                pks = list(
+                    model.objects.filter(pk__gt=last_pk)
+                    .order_by('pk')
+                    .values_list('pk', flat=True)[:batch_size]
+                )
+                if not pks:
+                    break
+                last_pk = pks[-1]
+                drifted += self._reconcile_batch(
+                    model, field, related_model, related_field, pks,
+                    options['dry_run'],
+                )
+            self.stdout.write(
+                f'{model._meta.label}.{field}: расхождений {drifted}'
+            )
@@ -0,0 +1,27 @@
+from django.core.management import BaseCommand
+
+from api.feed import trim_feeds
+from recipes.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = 'Обрезка лент подписок до FEED_TIMELINE_SIZE записей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        users = FeedEntry.objects.order_by('user_id').values_list(
+            'user_id', flat=True
+        ).distinct()
+        last_pk = 0
+        deleted = 0
+        while True:
+            user_ids = list(
+                users.filter(user_id__gt=last_pk)[:options['batch_size']]
+            )
+            if not user_ids:
+                break
+            last_pk = user_ids[-1]
+            deleted += trim_feeds(user_ids)
+        self.stdout.write(f'Удалено записей лент: {deleted}')
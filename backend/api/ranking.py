@@ -0,0 +1,51 @@
+import math
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone as django_timezone
+
+from recipes.models import Favorite, RecipeRanking, ShoppingCart
+
+# Начало отсчёта для логарифмической шкалы рейтинга.
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+EVENT_WEIGHTS = {Favorite: 1.0, ShoppingCart: 2.0}
+MIN_EXPONENT = -700.0
+
+
+def get_event_score(weight, moment=None):
+    # log(weight * 2 ** (часы с EPOCH / период полураспада))
+    moment = moment or django_timezone.now()
+    hours = (moment - EPOCH).total_seconds() / 3600
+    return (
+        hours / settings.RECIPE_TRENDING_HALF_LIFE_HOURS * math.log(2)
+        + math.log(weight)
+    )
+
+
+def log_add_exp(first, second):
+    # log(exp(a) + exp(b)) без переполнения. Показатель ограничен снизу:
+    # exp(-700) уже неотличим от нуля, а меньшие значения PostgreSQL
+    # отвергает с ошибкой underflow.
+    return Greatest(first, second) + Ln(
+        1 + Exp(Greatest(-Abs(first - second), Value(MIN_EXPONENT)))
+    )
+
+
+def record_ranking_events(relation_model, recipe_ids):
+    if not recipe_ids:
+        return
+    event_score = Value(get_event_score(EVENT_WEIGHTS[relation_model]))
+    # Строка рейтинга может отсутствовать (рецепт создан в обход сигналов
+    # или строку удалили) — досоздаём её, чтобы событие не потерялось.
+    RecipeRanking.objects.bulk_create(
+        [RecipeRanking(recipe_id=recipe_id) for recipe_id in recipe_ids],
+        ignore_conflicts=True,
+    )
+    RecipeRanking.objects.filter(recipe_id__in=recipe_ids).update(
+        score=Case(
+            When(score__isnull=True, then=event_score),
+            default=log_add_exp(F('score'), event_score),
+        )
+    )
@@ -0,0 +1,102 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache_versions import bump_version, get_version, get_versions
+
+VERSION_KEY = 'recipe_fragment_version:{recipe_id}'
+SHARED_VERSION_KEY = 'recipe_fragment_shared_version'
+FRAGMENT_KEY = 'recipe_fragment:{shared}:{host}:{recipe_id}:{version}'
+
+
+class LRUCache:
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_fragments = LRUCache(settings.RECIPE_FRAGMENT_LRU_SIZE)
+
+
+def invalidate_recipe_fragments(*recipe_ids):
+    bump_version(*(
+        VERSION_KEY.format(recipe_id=recipe_id) for recipe_id in recipe_ids
+    ))
+
+
+def invalidate_all_recipe_fragments():
+    bump_version(SHARED_VERSION_KEY)
+
+
+def get_fragment_keys(recipe_ids, host):
+    version_keys = {
+        recipe_id: VERSION_KEY.format(recipe_id=recipe_id)
+        for recipe_id in recipe_ids
+    }
+    versions = get_versions(list(version_keys.values()))
+    shared = get_version(SHARED_VERSION_KEY)
+    return {
+        recipe_id: FRAGMENT_KEY.format(
+            shared=shared,
+            host=host,
+            recipe_id=recipe_id,
+            version=versions[version_key],
+        )
+        for recipe_id, version_key in version_keys.items()
+    }
+
+
+def get_fragments(recipes, host, build_fragments):
+    # Сначала локальный LRU процесса, затем общий кеш,
+    # и только для оставшихся рецептов — сериализация.
+    keys = get_fragment_keys([recipe.id for recipe in recipes], host)
+    fragments = {}
+    for recipe in recipes:
+        fragment = local_fragments.get(keys[recipe.id])
+        if fragment is not None:
+            fragments[recipe.id] = fragment
+
+    missing = [recipe for recipe in recipes if recipe.id not in fragments]
+    if not missing:
+        return fragments
+
+    shared = cache.get_many([keys[recipe.id] for recipe in missing])
+    to_build = []
+    for recipe in missing:
+        fragment = shared.get(keys[recipe.id])
+        if fragment is None:
+            to_build.append(recipe)
+            continue
+        fragments[recipe.id] = fragment
+        local_fragments.set(keys[recipe.id], fragment)
+
+    if to_build:
+        built = {}
+        for recipe, fragment in zip(to_build, build_fragments(to_build)):
+            fragments[recipe.id] = fragment
+            built[keys[recipe.id]] = fragment
+            local_fragments.set(keys[recipe.id], fragment)
+        cache.set_many(built, settings.RECIPE_FRAGMENT_CACHE_TIMEOUT)
+    return fragments
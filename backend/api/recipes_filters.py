@@ -1,9 +1,31 @@
+from django.contrib.postgres.search import SearchRank
+from django.db.models import F
 from django_filters import rest_framework as df_filters
 
 from recipes.models import Recipe, Tag
+from .search import get_search_query
+
+
+# Порядок выдачи для ?ordering=; последний ключ делает его однозначным
+# для курсорной пагинации.
+RECIPE_ORDERINGS = {
+    'popular': ('-favorites_count', '-id'),
+    'trending': ('-trending_score', '-id'),
+}
+SEARCH_ORDERING = ('-search_rank', '-id')
 
 
 class RecipeFilter(df_filters.FilterSet):
+    # Поиск объявлен раньше ordering: явный ?ordering= переопределяет
+    # сортировку по релевантности.
+    search = df_filters.CharFilter(method='filter_search')
+    ordering = df_filters.ChoiceFilter(
+        choices=(
+            ('popular', 'Самые популярные'),
+            ('trending', 'Набирающие популярность'),
+        ),
+        method='filter_ordering',
+    )
     is_in_shopping_cart = df_filters.BooleanFilter(
         method='filter_shopping_cart'
     )
@@ -23,7 +45,9 @@ class RecipeFilter(df_filters.FilterSet):
             'tags',
             'author',
             'is_in_shopping_cart',
-            'is_favorited'
+            'is_favorited',
+            'search',
+            'ordering',
         )
 
     def filter_shopping_cart(self, queryset, name, recipes):
@@ -42,3 +66,19 @@ class RecipeFilter(df_filters.FilterSet):
         if self.request.user.is_authenticated:
             return queryset.filter(**{'favorites__user': self.request.user})
         return queryset.none()
+
+    def filter_ordering(self, queryset, name, ordering):
+        if ordering == 'trending':
+            # Внутреннее соединение позволяет читать рецепты в порядке
+            # индекса reciperanking_score_idx; рецепты без событий
+            # в список не попадают.
+            queryset = queryset.filter(ranking__score__isnull=False).annotate(
+                trending_score=F('ranking__score')
+            )
+        return queryset.order_by(*RECIPE_ORDERINGS[ordering])
+
+    def filter_search(self, queryset, name, value):
+        query = get_search_query(value)
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by(*SEARCH_ORDERING)
@@ -1,6 +1,11 @@
+import json
+from functools import partial
+
 from django.core.validators import MinValueValidator
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
-from drf_extra_fields.fields import Base64ImageField
+from rest_framework.permissions import SAFE_METHODS
 
 from recipes.models import (
     Recipe,
@@ -8,11 +13,20 @@ from recipes.models import (
     Ingredient,
     Tag,
 )
+from .cook_index import cook_index
+from .fields import (
+    BulkPrimaryKeyRelatedField,
+    BulkRelatedListSerializer,
+    ImageField,
+    ImageVariantsField,
+)
+from .recipe_fragments import get_fragments
 from .serializers import UserSerializer, TagSerializer
+from .similarity import mark_similar_outdated
 
 
 class RecipeIngSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
+    id = BulkPrimaryKeyRelatedField(
         queryset=Ingredient.objects.all(),
         source='ingredient.id',
     )
@@ -36,6 +50,14 @@ class RecipeIngSerializer(serializers.ModelSerializer):
             'amount'
         )
         model = RecipeIng
+        list_serializer_class = BulkRelatedListSerializer
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        recipes = data.all() if hasattr(data, 'all') else data
+        return self.child.represent_many(list(recipes))
 
 
 class RecipeSerializer(serializers.ModelSerializer):
@@ -44,11 +66,12 @@ class RecipeSerializer(serializers.ModelSerializer):
         many=True,
         source='recipe_ingredients',
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         many=True,
     )
-    image = Base64ImageField()
+    image = ImageField()
+    image_variants = ImageVariantsField()
     cooking_time = serializers.IntegerField(
         validators=(MinValueValidator(1),)
     )
@@ -64,20 +87,92 @@ class RecipeSerializer(serializers.ModelSerializer):
             'ingredients',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
             'is_favorited',
             'is_in_shopping_cart'
         )
+        list_serializer_class = RecipeListSerializer
 
-    def to_representation(self, instance):
+    def _build_fragment(self, instance):
         rep = super().to_representation(instance)
         rep['tags'] = TagSerializer(
             instance.tags.all(),
             many=True,
         ).data
+        rep['is_favorited'] = False
+        rep['is_in_shopping_cart'] = False
+        rep['author']['is_subscribed'] = False
         return rep
 
+    def _build_fragments(self, recipes):
+        prefetch_related_objects(
+            recipes,
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIng.objects.select_related('ingredient'),
+            ),
+        )
+        return [self._build_fragment(recipe) for recipe in recipes]
+
+    def represent_many(self, recipes):
+        request = self.context.get('request')
+        if request and request.method in SAFE_METHODS:
+            fragments = get_fragments(
+                recipes,
+                f'{request.scheme}://{request.get_host()}',
+                self._build_fragments,
+            )
+        else:
+            # Ответ на запись строится по объекту из памяти, который мог
+            # устареть к моменту фиксации транзакции, — в кеш его не кладём.
+            fragments = {
+                recipe.id: fragment
+                for recipe, fragment in zip(
+                    recipes, self._build_fragments(recipes)
+                )
+            }
+        return [
+            {
+                **fragments[recipe.id],
+                'author': {
+                    **fragments[recipe.id]['author'],
+                    'is_subscribed': self.fields['author'].get_is_subscribed(
+                        recipe.author
+                    ),
+                },
+                'is_favorited': self.get_is_favorited(recipe),
+                'is_in_shopping_cart': self.get_is_in_shopping_cart(recipe),
+            }
+            for recipe in recipes
+        ]
+
+    def to_representation(self, instance):
+        return self.represent_many([instance])[0]
+
+    def to_internal_value(self, data):
+        if hasattr(data, 'getlist'):
+            data = self._parse_form_data(data)
+        return super().to_internal_value(data)
+
+    @staticmethod
+    def _parse_form_data(data):
+        # В multipart/form-data теги передаются повторяющимся полем,
+        # а ингредиенты — JSON-строкой.
+        parsed = data.dict()
+        if 'tags' in data:
+            parsed['tags'] = data.getlist('tags')
+        if 'ingredients' in data:
+            try:
+                parsed['ingredients'] = json.loads(data['ingredients'])
+            except ValueError:
+                raise serializers.ValidationError(
+                    {'ingredients': 'Некорректный JSON в поле ingredients.'}
+                )
+        return parsed
+
     def validate(self, data):
         request = self.context.get('request')
         method = request.method if request else None
@@ -140,6 +235,7 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         RecipeIng.objects.bulk_create(recipe_ingredients)
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('recipe_ingredients', [])
         tags_data = validated_data.pop('tags', [])
@@ -147,8 +243,10 @@ class RecipeSerializer(serializers.ModelSerializer):
         recipe = super().create(validated_data)
         recipe.tags.set(tags_data)
         self._create_recipe_ingredients(recipe, ingredients_data)
+        transaction.on_commit(partial(cook_index.update_recipes, recipe.pk))
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         validated_data_copy = validated_data.copy()
 
@@ -159,21 +257,71 @@ class RecipeSerializer(serializers.ModelSerializer):
         tags_data = validated_data_copy.pop('tags', [])
 
         instance = super().update(instance, validated_data_copy)
+        # set() сам сравнивает текущие теги с новыми и пишет только разницу.
         instance.tags.set(tags_data)
 
-        instance.recipe_ingredients.all().delete()
-        self._create_recipe_ingredients(instance, ingredients_data)
+        if self._update_recipe_ingredients(instance, ingredients_data):
+            transaction.on_commit(
+                partial(cook_index.update_recipes, instance.pk)
+            )
+            mark_similar_outdated(instance.pk)
 
         return instance
 
-    def get_is_favorited(self, obj):
+    @staticmethod
+    def _update_recipe_ingredients(recipe, ingredients_data):
+        # Изменяются только отличающиеся строки; возвращает True,
+        # если состав рецепта поменялся.
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipe_ingredients.all()
+        }
+        to_create = []
+        to_update = []
+        seen_ingredients = set()
+
+        for ingredient_data in ingredients_data:
+            ingredient = ingredient_data['ingredient']['id']
+            amount = ingredient_data['amount']
+
+            if ingredient.id in seen_ingredients:
+                continue
+            seen_ingredients.add(ingredient.id)
+
+            recipe_ingredient = current.get(ingredient.id)
+            if recipe_ingredient is None:
+                to_create.append(RecipeIng(
+                    recipe=recipe, ingredient=ingredient, amount=amount,
+                ))
+            elif recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                to_update.append(recipe_ingredient)
+
+        to_delete = [
+            recipe_ingredient.id
+            for ingredient_id, recipe_ingredient in current.items()
+            if ingredient_id not in seen_ingredients
+        ]
+        if to_delete:
+            RecipeIng.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            RecipeIng.objects.bulk_update(to_update, ('amount',))
+        if to_create:
+            RecipeIng.objects.bulk_create(to_create)
+        return bool(to_delete or to_update or to_create)
+
+    def _get_relation_flag(self, obj, flag, related_name):
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             return False
-        return obj.favorites.filter(user=request.user).exists()
+        if hasattr(obj, flag):
+            return getattr(obj, flag)
+        return getattr(obj, related_name).filter(user=request.user).exists()
+
+    def get_is_favorited(self, obj):
+        return self._get_relation_flag(obj, 'is_favorited', 'favorites')
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return False
-        return obj.shopping_carts.filter(user=request.user).exists()
+        return self._get_relation_flag(
+            obj, 'is_in_shopping_cart', 'shopping_carts'
+        )
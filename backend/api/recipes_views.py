@@ -1,9 +1,6 @@
-from io import BytesIO
-from datetime import datetime
-
+from django.conf import settings
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import FileResponse
-from django.db.models import Sum
+from django.db.models import Exists, OuterRef
 from django.shortcuts import get_object_or_404
 from rest_framework import (
     decorators,
@@ -13,26 +10,41 @@ from rest_framework import (
     response
 )
 from django.urls import reverse
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.urls import replace_query_param
 
 from recipes.models import (
     Recipe,
     ShoppingCart,
-    RecipeIng,
     Favorite,
+    SimilarRecipe,
 )
-from .paginations import Pagination
+from .paginations import KeysetPaginationMixin, Pagination
+from .renderers import CsvRenderer, PdfRenderer, TxtRenderer
 from .recipes_permissions import IsAuthorOrReadOnly
 from .recipes_serializers import (
     RecipeSerializer,
 )
 from .serializers import (
     SimRecipeSerializer, FavoriteSerializer,
-    ShoppingCartSerializer, RemoveRelationSerializer
+    ShoppingCartSerializer, RemoveRelationSerializer,
+    BulkRelationSerializer,
+)
+from .cook_index import cook_index
+from .feed import get_feed_recipe_ids
+from .recipes_filters import RECIPE_ORDERINGS, SEARCH_ORDERING, RecipeFilter
+from .response_cache import AnonymousResponseCacheMixin
+from .shopping_list import (
+    invalidate_shopping_list,
+    shopping_list_response,
 )
-from .recipes_filters import RecipeFilter
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    AnonymousResponseCacheMixin,
+    KeysetPaginationMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = (
@@ -42,38 +54,85 @@ class RecipeViewSet(viewsets.ModelViewSet):
     pagination_class = Pagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    # favorites_count и рейтинг меняются через update() без сигналов.
+    uncached_query_params = ('ordering',)
+
+    @property
+    def keyset_ordering(self):
+        params = self.request.query_params
+        if params.get('ordering') in RECIPE_ORDERINGS:
+            return RECIPE_ORDERINGS[params['ordering']]
+        if params.get('search'):
+            return SEARCH_ORDERING
+        return ('name', 'id')
+
+    def get_queryset(self):
+        # Теги и ингредиенты подгружаются сериализатором только для
+        # рецептов, которых нет в кеше фрагментов.
+        queryset = super().get_queryset().select_related('author').defer(
+            'search_vector'
+        )
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset
+        return queryset.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+        )
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
     @staticmethod
-    def _add_relation(request, pk, serializer_class, model, relation_name):
+    def _add_relation(request, pk, serializer_class):
         recipe = get_object_or_404(Recipe, id=pk)
 
         serializer = serializer_class(
-            data={'recipe': recipe.id},
+            data={},
             context={'request': request}
         )
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        serializer.save(recipe=recipe)
 
         return response.Response(
             SimRecipeSerializer(recipe, context={'request': request}).data,
             status=status.HTTP_201_CREATED
         )
 
-    def _remove_relation(self, request, pk, model):
-        recipe = self.get_object()
+    @staticmethod
+    def _remove_relation(request, pk, model):
+        recipe = get_object_or_404(Recipe, id=pk)
 
         serializer = RemoveRelationSerializer(
-            data={'recipe': recipe.id},
+            data={},
             context={'request': request, 'model': model}
         )
         serializer.is_valid(raise_exception=True)
-        serializer.delete_relation()
+        serializer.delete_relation(recipe)
 
         return response.Response(status=status.HTTP_204_NO_CONTENT)
 
+    @staticmethod
+    def _bulk_relations(request, model, relation_name):
+        serializer = BulkRelationSerializer(
+            data=request.data,
+            context={
+                'request': request,
+                'model': model,
+                'relation_name': relation_name,
+            }
+        )
+        serializer.is_valid(raise_exception=True)
+        if request.method == 'POST':
+            results = serializer.add_relations()
+        else:
+            results = serializer.remove_relations()
+        return response.Response({'results': results})
+
     @decorators.action(
         detail=True,
         methods=('post',),
@@ -81,9 +140,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=(permissions.IsAuthenticated,),
     )
     def favorite(self, request, pk=None):
-        return self._add_relation(
-            request, pk, FavoriteSerializer, Favorite, 'избранном'
-        )
+        return self._add_relation(request, pk, FavoriteSerializer)
 
     @favorite.mapping.delete
     def remove_from_favorite(self, request, pk=None):
@@ -96,13 +153,39 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=(permissions.IsAuthenticated,),
     )
     def shopping_cart(self, request, pk=None):
-        return self._add_relation(
-            request, pk, ShoppingCartSerializer, ShoppingCart, 'корзине'
-        )
+        response = self._add_relation(request, pk, ShoppingCartSerializer)
+        invalidate_shopping_list(request.user.id)
+        return response
 
     @shopping_cart.mapping.delete
     def remove_from_shopping_cart(self, request, pk=None):
-        return self._remove_relation(request, pk, ShoppingCart)
+        response = self._remove_relation(request, pk, ShoppingCart)
+        invalidate_shopping_list(request.user.id)
+        return response
+
+    @decorators.action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='favorite/bulk',
+        url_name='favorite_bulk',
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def favorite_bulk(self, request):
+        return self._bulk_relations(request, Favorite, 'избранном')
+
+    @decorators.action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='shopping_cart/bulk',
+        url_name='shopping_cart_bulk',
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def shopping_cart_bulk(self, request):
+        response = self._bulk_relations(
+            request, ShoppingCart, 'корзине покупок'
+        )
+        invalidate_shopping_list(request.user.id)
+        return response
 
     @decorators.action(
         detail=True,
@@ -119,51 +202,121 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @decorators.action(
         detail=False,
         methods=('get',),
-        url_path='download_shopping_cart',
         permission_classes=(permissions.IsAuthenticated,),
     )
-    def download_shopping_cart(self, request):
-        recipes = Recipe.objects.filter(
-            shopping_carts__in=request.user.shopping_carts.all()
-        ).prefetch_related(
-            'recipe_ingredients__ingredient',
-            'author'
+    def feed(self, request):
+        # Рецепты авторов из подписок, новые сверху; ?before=<id рецепта>
+        # продолжает ленту с указанного места.
+        before = request.query_params.get('before')
+        if before is not None:
+            try:
+                before = int(before)
+            except ValueError:
+                raise ValidationError({'before': 'Ожидается id рецепта.'})
+        limit = Pagination().get_page_size(request)
+        recipe_ids = get_feed_recipe_ids(request.user, before, limit + 1)
+        recipes = self.get_queryset().in_bulk(recipe_ids[:limit])
+        serializer = self.get_serializer(
+            [recipes[recipe_id] for recipe_id in recipe_ids[:limit]
+             if recipe_id in recipes],
+            many=True,
         )
+        next_link = None
+        if len(recipe_ids) > limit:
+            next_link = replace_query_param(
+                request.build_absolute_uri(), 'before', recipe_ids[limit - 1]
+            )
+        return response.Response({
+            'next': next_link,
+            'results': serializer.data,
+        })
 
-        ingredients = (
-            RecipeIng.objects.filter(recipe__in=recipes)
-            .values('ingredient__name', 'ingredient__measurement_unit')
-            .annotate(total_amount=Sum('amount'))
-            .order_by('ingredient__name')
+    @decorators.action(
+        detail=True,
+        methods=('get',),
+    )
+    def similar(self, request, pk=None):
+        # Список считается командой compute_similar_recipes и читается
+        # по индексу (recipe, -score) одним запросом.
+        entries = SimilarRecipe.objects.filter(recipe_id=pk).select_related(
+            'similar'
+        ).only(
+            'score',
+            'similar__name',
+            'similar__image',
+            'similar__image_variants',
+            'similar__cooking_time',
+        ).order_by('-score')
+        if not entries:
+            get_object_or_404(Recipe, id=pk)
+        data = SimRecipeSerializer(
+            [entry.similar for entry in entries],
+            many=True,
+            context={'request': request},
+        ).data
+        for item, entry in zip(data, entries):
+            item['score'] = round(entry.score, 4)
+        return response.Response(data)
+
+    @decorators.action(
+        detail=False,
+        methods=('get',),
+        url_path='cook',
+    )
+    def cook(self, request):
+        # Рецепты по имеющимся ингредиентам ?ingredients=1,2,3: сначала
+        # те, для которых есть всё, затем с одним недостающим и т. д.
+        params = request.query_params
+        ingredient_ids = set()
+        for value in params.getlist('ingredients'):
+            for ingredient_id in value.split(','):
+                try:
+                    ingredient_ids.add(int(ingredient_id))
+                except ValueError:
+                    raise ValidationError(
+                        {'ingredients': 'Ожидается список id ингредиентов.'}
+                    )
+        if not ingredient_ids:
+            raise ValidationError(
+                {'ingredients': 'Укажите хотя бы один ингредиент.'}
+            )
+        if len(ingredient_ids) > settings.COOK_MAX_INGREDIENTS:
+            raise ValidationError({'ingredients': (
+                f'Не больше {settings.COOK_MAX_INGREDIENTS} ингредиентов.'
+            )})
+        try:
+            max_missing = int(
+                params.get('max_missing', settings.COOK_MAX_MISSING)
+            )
+        except ValueError:
+            max_missing = -1
+        if max_missing < 0:
+            raise ValidationError(
+                {'max_missing': 'Ожидается неотрицательное число.'}
+            )
+        matches = cook_index.search(ingredient_ids, max_missing)
+        paginator = Pagination()
+        page = paginator.paginate_queryset(matches, request, view=self)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
         )
+        page = [row for row in page if row[0] in recipes]
+        data = self.get_serializer(
+            [recipes[recipe_id] for recipe_id, _, _ in page], many=True
+        ).data
+        for item, (_, missing, matched) in zip(data, page):
+            item['missing_ingredients'] = missing
+            item['matched_ingredients'] = matched
+        return paginator.get_paginated_response(data)
 
-        datetime_str = datetime.now().strftime('%Y%m%d')
-        count_of_recipes = len(recipes)
-        count_of_ings = len(ingredients)
-        report_content = [
-            'Список покупок',
-            f'Дата составления: {datetime_str}',
-            f'Всего рецептов: {count_of_recipes}',
-            f'Всего ингредиентов: {count_of_ings}',
-            '',
-            'Список продуктов:',
-            *[
-                f'{idx}. {ing["ingredient__name"].title()} - '
-                f'{ing["total_amount"]} {ing["ingredient__measurement_unit"]}'
-                for idx, ing in enumerate(ingredients, start=1)
-            ],
-            '',
-            'Рецепты:',
-            *[
-                f'- {recipe.name} (автор: {recipe.author.username})'
-                for recipe in recipes
-            ]
-        ]
-
-        buffer = BytesIO('\n'.join(report_content).encode('utf-8'))
-        return FileResponse(
-            buffer,
-            filename=f'shopping_list_{datetime_str}.txt',
-            content_type='text/plain',
-            as_attachment=True,
+    @decorators.action(
+        detail=False,
+        methods=('get',),
+        url_path='download_shopping_cart',
+        permission_classes=(permissions.IsAuthenticated,),
+        renderer_classes=(TxtRenderer, CsvRenderer, PdfRenderer),
+    )
+    def download_shopping_cart(self, request):
+        return shopping_list_response(
+            request.user, request.accepted_renderer.format
         )
@@ -0,0 +1,108 @@
+from hashlib import md5
+from time import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .cache_versions import bump_version, get_version
+
+VERSION_KEY = 'response_cache_version'
+
+
+def invalidate_response_cache():
+    bump_version(VERSION_KEY)
+
+
+class AnonymousResponseCacheMixin:
+    # Готовые ответы на анонимные GET-запросы кешируются целиком
+    # и сбрасываются сменой версии при изменении рецептов, тегов
+    # и ингредиентов (см. api/signals.py).
+    cached_actions = ('list', 'retrieve')
+    # Параметры, с которыми ответ меняется без сигналов моделей
+    # (например, порядок по счётчикам), — такие ответы не кешируются.
+    uncached_query_params = ()
+
+    def _is_cacheable(self, request):
+        # Проверка идёт после аутентификации DRF: общий кеш не должен
+        # отдавать и сохранять ответы для пользователя, вошедшего любым
+        # способом, а не только по заголовку Authorization.
+        return (
+            request.method == 'GET'
+            and self.action in self.cached_actions
+            and request.user.is_anonymous
+            and not any(
+                param in request.query_params
+                for param in self.uncached_query_params
+            )
+        )
+
+    @staticmethod
+    def _get_cache_key(request):
+        query = urlencode(
+            sorted(
+                (key, sorted(values)) for key, values in request.GET.lists()
+            ),
+            doseq=True,
+        )
+        # Ответ содержит абсолютные ссылки на изображения, поэтому хост
+        # и схема входят в ключ, как и в кеше фрагментов рецептов.
+        raw_key = '|'.join((
+            request.scheme,
+            request.get_host(),
+            request.path,
+            query,
+            request.META.get('HTTP_ACCEPT', ''),
+        ))
+        return (
+            f'response:{get_version(VERSION_KEY)}:'
+            f'{md5(raw_key.encode()).hexdigest()}'
+        )
+
+    @staticmethod
+    def _build_response(entry):
+        response = HttpResponse(
+            entry['content'], content_type=entry['content_type']
+        )
+        response['ETag'] = entry['etag']
+        response['Last-Modified'] = http_date(entry['last_modified'])
+        patch_vary_headers(response, ('Accept', 'Authorization'))
+        return response
+
+    def _get_response(self, handler, request, *args, **kwargs):
+        if not self._is_cacheable(request):
+            return handler(request, *args, **kwargs)
+
+        key = self._get_cache_key(request)
+        entry = cache.get(key)
+        if entry is None:
+            response = self.finalize_response(
+                request, handler(request, *args, **kwargs), *args, **kwargs
+            )
+            if response.status_code != 200 or response.streaming:
+                return response
+            response.render()
+            entry = {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'etag': quote_etag(md5(response.content).hexdigest()),
+                'last_modified': int(time()),
+            }
+            cache.set(key, entry, settings.RESPONSE_CACHE_TIMEOUT)
+
+        response = self._build_response(entry)
+        return get_conditional_response(
+            request,
+            etag=entry['etag'],
+            last_modified=entry['last_modified'],
+            response=response,
+        ) or response
+
+    def list(self, request, *args, **kwargs):
+        return self._get_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._get_response(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.db.models import OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+from recipes.models import Recipe, RecipeIng
+
+
+def get_search_vector():
+    # Вес A — название, B — описание, C — названия ингредиентов.
+    config = settings.RECIPE_SEARCH_CONFIG
+    ingredient_names = Subquery(
+        RecipeIng.objects.filter(recipe=OuterRef('pk'))
+        .order_by()
+        .values('recipe')
+        .annotate(names=StringAgg('ingredient__name', ' '))
+        .values('names')
+    )
+    return (
+        SearchVector('name', weight='A', config=config)
+        + SearchVector('text', weight='B', config=config)
+        + SearchVector(
+            Coalesce(ingredient_names, Value(''), output_field=TextField()),
+            weight='C',
+            config=config,
+        )
+    )
+
+
+def get_search_query(value):
+    return SearchQuery(
+        value, config=settings.RECIPE_SEARCH_CONFIG, search_type='websearch'
+    )
+
+
+def update_search_vectors(recipes):
+    recipes.update(search_vector=get_search_vector())
+
+
+def update_recipe_search_vectors(*recipe_ids):
+    update_search_vectors(Recipe.objects.filter(pk__in=recipe_ids))
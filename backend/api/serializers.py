@@ -1,37 +1,55 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from drf_extra_fields.fields import Base64ImageField
+from django.db import IntegrityError, connection, transaction
 from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
 from django.core.files.storage import default_storage
 from djoser.serializers import (
     UserSerializer as DjoserUserSerializer
 )
 
 from recipes.models import Recipe, Tag, Ingredient, ShoppingCart, Favorite
+from .counters import (
+    change_recipe_counter,
+    change_subscribers_counter,
+    refresh_recipe_counter,
+)
+from .feed import add_author_to_feed, remove_author_from_feed
+from .fields import ImageField, ImageVariantsField
+from .ranking import record_ranking_events
 from users.models import Sub
 
 User = get_user_model()
 
 
+def violates_constraint(error, name):
+    # Повтор определяется только по имени нарушенного ограничения:
+    # например, удалённый параллельно рецепт даёт ошибку внешнего ключа,
+    # и её нельзя выдавать за «уже добавлен».
+    diag = getattr(error.__cause__, 'diag', None)
+    return getattr(diag, 'constraint_name', None) == name
+
+
 class RemoveRelationSerializer(serializers.Serializer):
-    recipe = serializers.PrimaryKeyRelatedField(queryset=Recipe.objects.all())
 
-    def validate(self, attrs):
+    def delete_relation(self, recipe):
+        # Отсутствие связи определяется по числу удалённых строк,
+        # без отдельной проверки exists().
         request = self.context['request']
-        recipe = attrs['recipe']
         model = self.context['model']
 
-        relation = model.objects.filter(user=request.user, recipe=recipe)
-        if not relation.exists():
-            raise serializers.ValidationError(
-                f'Рецепт не найден в {model._meta.verbose_name}'
-            )
-        attrs['relation'] = relation
-        return attrs
-
-    def delete_relation(self):
-        relation = self.validated_data['relation']
-        relation.delete()
+        with transaction.atomic():
+            deleted, _ = model.objects.filter(
+                user=request.user, recipe=recipe
+            ).delete()
+            if deleted:
+                change_recipe_counter(model, recipe.id, -deleted)
+        if not deleted:
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    f'Рецепт не найден в {model._meta.verbose_name}'
+                ]
+            })
 
 
 class IngSerializer(serializers.ModelSerializer):
@@ -47,16 +65,29 @@ class TagSerializer(serializers.ModelSerializer):
 
 
 class UserSerializer(DjoserUserSerializer):
-    avatar = Base64ImageField(required=False, allow_null=True)
+    avatar = ImageField(required=False, allow_null=True)
+    avatar_variants = ImageVariantsField()
     is_subscribed = serializers.SerializerMethodField()
 
+    @staticmethod
+    def _get_subscribed_ids(request):
+        subscribed_ids = getattr(request, '_subscribed_ids', None)
+        if subscribed_ids is None:
+            subscribed_ids = frozenset(
+                request.user.subscriptions.values_list(
+                    'subscribed_to_id', flat=True
+                )
+            )
+            request._subscribed_ids = subscribed_ids
+        return subscribed_ids
+
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
         if not request:
             return False
         if not request.user.is_authenticated:
             return False
-        return request.user.subscriptions.filter(subscribed_to=obj).exists()
+        return obj.id in self._get_subscribed_ids(request)
 
     class Meta:
         model = User
@@ -67,7 +98,8 @@ class UserSerializer(DjoserUserSerializer):
             'id',
             'email',
             'is_subscribed',
-            'avatar'
+            'avatar',
+            'avatar_variants',
         )
         read_only_fields = (
             'is_subscribed',
@@ -75,7 +107,7 @@ class UserSerializer(DjoserUserSerializer):
 
 
 class AvatarSerializer(serializers.Serializer):
-    avatar = Base64ImageField()
+    avatar = ImageField()
 
 
 class AvatarDeleteSerializer(serializers.Serializer):
@@ -102,12 +134,15 @@ class AvatarDeleteSerializer(serializers.Serializer):
 
 
 class SimRecipeSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
         fields = (
             'id',
             'name',
             'image',
+            'image_variants',
             'cooking_time'
         )
         read_only_fields = (
@@ -119,10 +154,7 @@ class SimRecipeSerializer(serializers.ModelSerializer):
 
 class UserSubSerializer(UserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
-
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta:
         fields = (
@@ -135,6 +167,7 @@ class UserSubSerializer(UserSerializer):
             'recipes',
             'recipes_count',
             'avatar',
+            'avatar_variants',
         )
         read_only_fields = (
             'email',
@@ -158,24 +191,38 @@ class UserSubSerializer(UserSerializer):
                     'subscribed_to': 'Нельзя подписаться на самого себя'
                 }
             )
-        if Sub.objects.filter(
-                user=user,
-                subscribed_to=author
-        ).exists():
+        return data
+
+    def create_subscription(self, author):
+        # Повторная подписка отсекается ограничением unique_subscription.
+        user = self.context['request'].user
+        try:
+            with transaction.atomic():
+                Sub.objects.create(user=user, subscribed_to=author)
+                change_subscribers_counter(author.id, 1)
+                add_author_to_feed(user, author)
+        except IntegrityError as error:
+            if not violates_constraint(error, 'unique_subscription'):
+                raise
             raise serializers.ValidationError(
-                {'subscribed_to': 'Вы уже подписаны на этого пользователя'}
+                {'subscribed_to': ['Вы уже подписаны на этого пользователя']}
             )
-        return data
+        return author
 
-    def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes = obj.recipes.all()
-        limit = request.GET.get('recipes_limit')
+    @staticmethod
+    def get_recipes_limit(request):
         try:
-            limit = int(limit)
+            limit = int(request.GET.get('recipes_limit'))
         except (ValueError, TypeError):
-            pass
-        recipes = recipes[:limit]
+            return None
+        return limit if limit >= 0 else None
+
+    def get_recipes(self, obj):
+        if hasattr(obj, 'recipes_preview'):
+            recipes = obj.recipes_preview
+        else:
+            limit = self.get_recipes_limit(self.context.get('request'))
+            recipes = obj.recipes.all()[:limit]
         return SimRecipeSerializer(
             recipes, many=True, context=self.context
         ).data
@@ -183,61 +230,172 @@ class UserSubSerializer(UserSerializer):
 
 class SubscriptionDeleteSerializer(serializers.Serializer):
 
-    def validate(self, attrs):
-        request = self.context.get('request')
-        view = self.context.get('view')
-
-        if request and view:
-            author = view.get_object()
-            if not request.user.subscriptions.filter(
-                    subscribed_to=author).exists():
-                raise serializers.ValidationError('Подписка не найдена.')
-
-        return attrs
+    def delete_subscription(self, author):
+        user = self.context['request'].user
+        with transaction.atomic():
+            deleted, _ = user.subscriptions.filter(
+                subscribed_to=author
+            ).delete()
+            if deleted:
+                change_subscribers_counter(author.id, -deleted)
+                remove_author_from_feed(user, author)
+        if not deleted:
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: ['Подписка не найдена.']
+            })
 
 
 class FavoriteShoppingCartSerializer(serializers.ModelSerializer):
+    # Рецепт передаётся в save(); повтор отсекается ограничением
+    # unique_<модель> одним INSERT без предварительного exists().
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
+    relation_name = None
 
     class Meta:
         fields = ('user', 'recipe')
+        read_only_fields = ('recipe',)
+        validators = ()
+
+    def create(self, validated_data):
+        try:
+            with transaction.atomic():
+                instance = super().create(validated_data)
+                change_recipe_counter(
+                    self.Meta.model, instance.recipe_id, 1
+                )
+                record_ranking_events(self.Meta.model, (instance.recipe_id,))
+                return instance
+        except IntegrityError as error:
+            if not violates_constraint(
+                error, f'unique_{self.Meta.model._meta.model_name}'
+            ):
+                raise
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    f'Рецепт "{validated_data["recipe"].name}" уже в '
+                    f'{self.relation_name}'
+                ]
+            })
 
 
 class FavoriteSerializer(FavoriteShoppingCartSerializer):
+    relation_name = 'избранном'
+
     class Meta(FavoriteShoppingCartSerializer.Meta):
         model = Favorite
 
-    def validate(self, data):
-        user = data['user']
-        recipe = data['recipe']
-
-        if Favorite.objects.filter(user=user, recipe=recipe).exists():
-            raise serializers.ValidationError(
-                f'Рецепт "{recipe.name}" уже в избранном'
-            )
-        return data
-
 
 class ShoppingCartSerializer(FavoriteShoppingCartSerializer):
+    relation_name = 'корзине покупок'
+
     class Meta(FavoriteShoppingCartSerializer.Meta):
         model = ShoppingCart
         extra_kwargs = {
-            'recipe': {'write_only': True},
             'user': {'write_only': True}
         }
 
-    def validate(self, data):
-        user = data['user']
-        recipe = data['recipe']
-
-        if ShoppingCart.objects.filter(user=user, recipe=recipe).exists():
-            raise serializers.ValidationError(
-                f'Рецепт "{recipe.name}" уже в корзине покупок'
-            )
-        return data
-
     def to_representation(self, instance):
         return SimRecipeSerializer(
             instance.recipe,
             context=self.context
         ).data
+
+
+class BulkRelationSerializer(serializers.Serializer):
+    # Пакетное добавление и удаление рецептов в избранном или корзине
+    # покупок: результат возвращается по каждому id отдельно.
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100,
+    )
+
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
+
+    def _execute(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                sql.format(
+                    table=self.context['model']._meta.db_table,
+                    recipe_table=Recipe._meta.db_table,
+                ),
+                params,
+            )
+            return {row[0] for row in cursor.fetchall()}
+
+    def add_relations(self):
+        # Созданными считаются только строки, которые вернул INSERT:
+        # связи, добавленные параллельным запросом, попадут в 'exists'
+        # и не увеличат счётчик и рейтинг повторно.
+        model = self.context['model']
+        recipe_ids = self.validated_data['recipes']
+        recipes = Recipe.objects.in_bulk(recipe_ids)
+        created_ids = set()
+        if recipes:
+            with transaction.atomic():
+                created_ids = self._execute(
+                    '''
+                    INSERT INTO {table} (user_id, recipe_id)
+                    SELECT %s, id FROM {recipe_table}
+                    WHERE id = ANY(%s)
+                    ON CONFLICT DO NOTHING
+                    RETURNING recipe_id
+                    ''',
+                    (self.context['request'].user.id, list(recipes)),
+                )
+                if created_ids:
+                    refresh_recipe_counter(model, created_ids)
+                    record_ranking_events(model, list(created_ids))
+        results = []
+        for recipe_id in recipe_ids:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                results.append({
+                    'id': recipe_id,
+                    'status': 'not_found',
+                    'detail': 'Рецепт не найден.',
+                })
+            elif recipe_id not in created_ids:
+                results.append({
+                    'id': recipe_id,
+                    'status': 'exists',
+                    'detail': (
+                        f'Рецепт "{recipe.name}" уже в '
+                        f'{self.context["relation_name"]}'
+                    ),
+                })
+            else:
+                results.append({
+                    'id': recipe_id,
+                    'status': 'created',
+                    'recipe': SimRecipeSerializer(
+                        recipe, context=self.context
+                    ).data,
+                })
+        return results
+
+    def remove_relations(self):
+        # Удалённые связи берутся из RETURNING самого DELETE.
+        model = self.context['model']
+        recipe_ids = self.validated_data['recipes']
+        with transaction.atomic():
+            deleted_ids = self._execute(
+                '''
+                DELETE FROM {table}
+                WHERE user_id = %s AND recipe_id = ANY(%s)
+                RETURNING recipe_id
+                ''',
+                (self.context['request'].user.id, recipe_ids),
+            )
+            if deleted_ids:
+                refresh_recipe_counter(model, deleted_ids)
+        return [
+            {'id': recipe_id, 'status': 'deleted'}
+            if recipe_id in deleted_ids else {
+                'id': recipe_id,
+                'status': 'not_found',
+                'detail': f'Рецепт не найден в {model._meta.verbose_name}',
+            }
+            for recipe_id in recipe_ids
+        ]
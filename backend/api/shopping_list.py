@@ -0,0 +1,170 @@
+import csv
+from datetime import datetime
+from functools import partial
+from itertools import islice
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from django.http import FileResponse, StreamingHttpResponse
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from recipes.models import Recipe, RecipeIng, ShoppingCart
+from .cache_versions import bump_version, get_version
+
+CHUNK_SIZE = 2000
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_FONT_SIZE = 12
+PDF_LINE_HEIGHT = 16
+PDF_MARGIN = 50
+PDF_MAX_MEMORY_SIZE = 5 * 1024 * 1024
+VERSION_KEY = 'shopping_list_version:{user_id}'
+DATA_KEY = 'shopping_list:{user_id}:{version}'
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def get_cart_recipes(user):
+    return Recipe.objects.filter(shopping_carts__user=user)
+
+
+def get_cart_ingredients(user):
+    return (
+        RecipeIng.objects.filter(recipe__shopping_carts__user=user)
+        .values('ingredient__name', 'ingredient__measurement_unit')
+        .annotate(total_amount=Sum('amount'))
+        .order_by('ingredient__name')
+    )
+
+
+def invalidate_shopping_list(*user_ids):
+    bump_version(*(
+        VERSION_KEY.format(user_id=user_id) for user_id in user_ids
+    ))
+
+
+def invalidate_recipe_shopping_lists(recipes):
+    # Владельцы корзин читаются сразу: после каскадного удаления строк
+    # корзины уже не будет, а сброс откладывается до коммита.
+    user_ids = list(
+        ShoppingCart.objects.filter(recipe__in=recipes)
+        .values_list('user_id', flat=True)
+        .distinct()
+    )
+    if user_ids:
+        transaction.on_commit(partial(invalidate_shopping_list, *user_ids))
+
+
+def get_shopping_list(user):
+    # В кеше только сводка ингредиентов. Список рецептов для txt и pdf
+    # каждый раз читается из базы одним потоковым запросом и не
+    # держится в памяти целиком, поэтому выгрузка не обходится без базы
+    # даже при попадании в кеш.
+    version = get_version(VERSION_KEY.format(user_id=user.id))
+    key = DATA_KEY.format(user_id=user.id, version=version)
+    shopping_list = cache.get(key)
+    if shopping_list is None:
+        shopping_list = {
+            'ingredients': [
+                (
+                    ing['ingredient__name'],
+                    ing['total_amount'],
+                    ing['ingredient__measurement_unit'],
+                )
+                for ing in get_cart_ingredients(user).iterator(
+                    chunk_size=CHUNK_SIZE
+                )
+            ],
+            'recipes_count': get_cart_recipes(user).count(),
+        }
+        cache.set(key, shopping_list, settings.SHOPPING_LIST_CACHE_TIMEOUT)
+    shopping_list['recipes'] = get_cart_recipes(user).values_list(
+        'name', 'author__username'
+    ).iterator(chunk_size=CHUNK_SIZE)
+    return shopping_list
+
+
+def report_lines(shopping_list, date_str):
+    yield 'Список покупок'
+    yield f'Дата составления: {date_str}'
+    yield f'Всего рецептов: {shopping_list["recipes_count"]}'
+    yield f'Всего ингредиентов: {len(shopping_list["ingredients"])}'
+    yield ''
+    yield 'Список продуктов:'
+    for idx, (name, amount, unit) in enumerate(
+        shopping_list['ingredients'], start=1
+    ):
+        yield f'{idx}. {name.title()} - {amount} {unit}'
+    yield ''
+    yield 'Рецепты:'
+    for name, username in shopping_list['recipes']:
+        yield f'- {name} (автор: {username})'
+
+
+def csv_lines(shopping_list):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Ингредиент', 'Количество', 'Единица измерения'))
+    for row in shopping_list['ingredients']:
+        yield writer.writerow(row)
+
+
+def encode_chunks(lines):
+    lines = iter(lines)
+    while batch := list(islice(lines, CHUNK_SIZE)):
+        yield ''.join(batch).encode('utf-8')
+
+
+def render_pdf(lines):
+    if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(
+            TTFont(PDF_FONT_NAME, settings.SHOPPING_LIST_PDF_FONT)
+        )
+    buffer = SpooledTemporaryFile(max_size=PDF_MAX_MEMORY_SIZE)
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    _, height = A4
+    y = height - PDF_MARGIN
+    pdf.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+    for line in lines:
+        if y < PDF_MARGIN:
+            pdf.showPage()
+            pdf.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+            y = height - PDF_MARGIN
+        pdf.drawString(PDF_MARGIN, y, line)
+        y -= PDF_LINE_HEIGHT
+    pdf.save()
+    buffer.seek(0)
+    return buffer
+
+
+def shopping_list_response(user, export_format):
+    date_str = datetime.now().strftime('%Y%m%d')
+    filename = f'shopping_list_{date_str}.{export_format}'
+    shopping_list = get_shopping_list(user)
+
+    if export_format == 'pdf':
+        return FileResponse(
+            render_pdf(report_lines(shopping_list, date_str)),
+            filename=filename,
+            content_type='application/pdf',
+            as_attachment=True,
+        )
+    if export_format == 'csv':
+        chunks = encode_chunks(csv_lines(shopping_list))
+        content_type = 'text/csv; charset=utf-8'
+    else:
+        chunks = encode_chunks(
+            f'{line}\n' for line in report_lines(shopping_list, date_str)
+        )
+        content_type = 'text/plain; charset=utf-8'
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
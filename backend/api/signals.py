@@ -0,0 +1,203 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from recipes.models import Ingredient, Recipe, RecipeIng, RecipeRanking, Tag
+from .cook_index import cook_index
+from .counters import change_recipes_counter
+from .feed import fan_out_recipe
+from .image_processing import delete_image_variants, enqueue_image_processing
+from .ingredient_index import ingredient_index
+from .recipe_fragments import (
+    invalidate_all_recipe_fragments,
+    invalidate_recipe_fragments,
+)
+from .response_cache import invalidate_response_cache
+from .search import update_recipe_search_vectors, update_search_vectors
+from .shopping_list import invalidate_recipe_shopping_lists
+from .similarity import mark_similar_outdated
+
+User = get_user_model()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    transaction.on_commit(ingredient_index.invalidate)
+
+
+@receiver(post_delete, sender=Ingredient)
+def invalidate_cook_index(sender, **kwargs):
+    transaction.on_commit(cook_index.invalidate)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_from_cook_index(sender, instance, **kwargs):
+    transaction.on_commit(partial(cook_index.update_recipes, instance.pk))
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=RecipeIng)
+@receiver((post_save, post_delete), sender=Tag)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_cached_responses(sender, **kwargs):
+    transaction.on_commit(invalidate_response_cache)
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_authors(sender, update_fields=None, **kwargs):
+    # Вход пользователя обновляет только last_login.
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    transaction.on_commit(invalidate_response_cache)
+    transaction.on_commit(invalidate_all_recipe_fragments)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_shared_recipe_fragments(sender, **kwargs):
+    transaction.on_commit(invalidate_all_recipe_fragments)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe_fragment(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_recipe_fragments, instance.pk))
+
+
+@receiver((post_save, post_delete), sender=RecipeIng)
+def invalidate_recipe_ingredients_fragment(sender, instance, **kwargs):
+    transaction.on_commit(
+        partial(invalidate_recipe_fragments, instance.recipe_id)
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags_fragment(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        transaction.on_commit(
+            partial(invalidate_recipe_fragments, instance.pk)
+        )
+    elif pk_set:
+        transaction.on_commit(partial(invalidate_recipe_fragments, *pk_set))
+    else:
+        transaction.on_commit(invalidate_all_recipe_fragments)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(pre_delete, sender=Recipe)
+def invalidate_recipe_carts(sender, instance, created=False, **kwargs):
+    # При удалении рецепта строки корзины удаляются каскадом раньше
+    # post_delete, поэтому владельцы корзин находятся в pre_delete.
+    if not created:
+        invalidate_recipe_shopping_lists([instance.pk])
+
+
+@receiver((post_save, post_delete), sender=RecipeIng)
+def invalidate_recipe_ingredient_carts(sender, instance, **kwargs):
+    invalidate_recipe_shopping_lists([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def invalidate_ingredient_carts(sender, instance, created, **kwargs):
+    # Удаление ингредиента каскадом удаляет RecipeIng, и списки
+    # сбрасывает обработчик выше.
+    if not created:
+        invalidate_recipe_shopping_lists(
+            Recipe.objects.filter(ingredients=instance).values('pk')
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(sender, instance, **kwargs):
+    enqueue_image_processing(instance, 'image')
+
+
+@receiver(post_save, sender=User)
+def process_user_avatar(sender, instance, **kwargs):
+    enqueue_image_processing(instance, 'avatar')
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_image_variants(sender, instance, **kwargs):
+    delete_image_variants(instance, 'image')
+
+
+@receiver(post_delete, sender=User)
+def delete_user_avatar_variants(sender, instance, **kwargs):
+    delete_image_variants(instance, 'avatar')
+
+
+@receiver(post_save, sender=Recipe)
+def increment_author_recipes(sender, instance, created, **kwargs):
+    if created:
+        change_recipes_counter(instance.author_id, 1)
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_ranking(sender, instance, created, **kwargs):
+    if created:
+        RecipeRanking.objects.create(recipe=instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_author_recipes(sender, instance, **kwargs):
+    change_recipes_counter(instance.author_id, -1)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_new_recipe(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(partial(fan_out_recipe, instance))
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe_search_vector(sender, instance, update_fields=None,
+                                 **kwargs):
+    # Вектор пересчитывается после коммита, когда ингредиенты рецепта
+    # уже сохранены.
+    if update_fields and not {'name', 'text'} & set(update_fields):
+        return
+    transaction.on_commit(
+        partial(update_recipe_search_vectors, instance.pk)
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_ingredient_search_vectors(sender, instance, created, **kwargs):
+    if not created:
+        transaction.on_commit(partial(
+            update_search_vectors,
+            Recipe.objects.filter(ingredients=instance),
+        ))
+
+
+@receiver((post_save, post_delete), sender=RecipeIng)
+def mark_recipe_similar_outdated(sender, instance, **kwargs):
+    # Пакетные изменения из RecipeSerializer помечают рецепт сами.
+    mark_similar_outdated(instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def mark_tagged_recipes_similar_outdated(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        mark_similar_outdated(instance.pk)
+    elif pk_set:
+        mark_similar_outdated(*pk_set)
+    else:
+        Recipe.objects.update(similar_outdated=True)
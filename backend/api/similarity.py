@@ -0,0 +1,165 @@
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+from scipy import sparse
+
+from recipes.models import Recipe, RecipeIng, SimilarRecipe
+
+CHUNK_SIZE = 10000
+
+
+def _load_pairs(queryset, *fields):
+    # Пары id читаются потоком прямо в массив numpy, без списка кортежей.
+    values = np.fromiter(
+        chain.from_iterable(
+            queryset.order_by().values_list(*fields).iterator(
+                chunk_size=CHUNK_SIZE
+            )
+        ),
+        dtype=np.int64,
+    )
+    return values.reshape(-1, 2)
+
+
+def load_matrix():
+    # Строка CSR-матрицы — рецепт, столбцы — ингредиенты и теги с весом
+    # TF-IDF; строки нормированы, поэтому X @ X.T даёт косинусное
+    # сходство. Признаки, встречающиеся слишком часто (соль, вода),
+    # отбрасываются: они почти не влияют на сходство, но делают
+    # произведение плотным.
+    recipe_ids = np.fromiter(
+        Recipe.objects.order_by('pk').values_list('pk', flat=True).iterator(
+            chunk_size=CHUNK_SIZE
+        ),
+        dtype=np.int64,
+    )
+    ingredients = _load_pairs(RecipeIng.objects, 'recipe_id', 'ingredient_id')
+    tags = _load_pairs(Recipe.tags.through.objects, 'recipe_id', 'tag_id')
+
+    _, ingredient_columns = np.unique(ingredients[:, 1], return_inverse=True)
+    _, tag_columns = np.unique(tags[:, 1], return_inverse=True)
+    ingredient_count = int(ingredient_columns.max(initial=-1)) + 1
+    matrix = sparse.csr_matrix(
+        (
+            np.concatenate((
+                np.ones(len(ingredients), dtype=np.float32),
+                np.full(
+                    len(tags),
+                    settings.SIMILAR_RECIPES_TAG_WEIGHT,
+                    dtype=np.float32,
+                ),
+            )),
+            (
+                np.searchsorted(
+                    recipe_ids, np.concatenate((ingredients[:, 0], tags[:, 0]))
+                ),
+                np.concatenate((
+                    ingredient_columns, tag_columns + ingredient_count
+                )),
+            ),
+        ),
+        shape=(
+            len(recipe_ids),
+            ingredient_count + int(tag_columns.max(initial=-1)) + 1,
+        ),
+        dtype=np.float32,
+    )
+    matrix.sum_duplicates()
+
+    frequencies = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    total = np.count_nonzero(np.diff(matrix.indptr))
+    idf = np.log((1 + total) / (1 + frequencies)) + 1
+    idf[frequencies > settings.SIMILAR_RECIPES_MAX_FREQUENCY] = 0
+    matrix.data *= idf[matrix.indices].astype(np.float32)
+    matrix.eliminate_zeros()
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    matrix.data /= np.repeat(norms, np.diff(matrix.indptr)).astype(np.float32)
+    return recipe_ids, matrix
+
+
+def get_similarity_rows(recipe_ids, matrix, targets):
+    # Строки X[targets] @ X.T без диагонали: сходство с каждым рецептом,
+    # у которого есть общий признак.
+    rows = np.searchsorted(recipe_ids, targets)
+    products = (matrix[rows] @ matrix.T).tocoo()
+    keep = products.col != rows[products.row]
+    return sparse.csr_matrix(
+        (products.data[keep], (products.row[keep], products.col[keep])),
+        shape=products.shape,
+    )
+
+
+def get_top_similar(recipe_ids, matrix, targets, count=None):
+    count = count or settings.SIMILAR_RECIPES_COUNT
+    products = get_similarity_rows(recipe_ids, matrix, targets)
+    top_similar = {}
+    for row, recipe_id in enumerate(targets):
+        start, end = products.indptr[row], products.indptr[row + 1]
+        columns = products.indices[start:end]
+        scores = products.data[start:end]
+        if len(scores) > count:
+            best = np.argpartition(-scores, count - 1)[:count]
+            columns, scores = columns[best], scores[best]
+        similar_ids = recipe_ids[columns]
+        order = np.lexsort((-similar_ids, -scores))
+        top_similar[int(recipe_id)] = [
+            (int(similar_ids[index]), float(scores[index]))
+            for index in order
+        ]
+    return top_similar
+
+
+def store_similar(top_similar):
+    with transaction.atomic():
+        SimilarRecipe.objects.filter(recipe_id__in=top_similar).delete()
+        SimilarRecipe.objects.bulk_create(
+            (
+                SimilarRecipe(
+                    recipe_id=recipe_id, similar_id=similar_id, score=score
+                )
+                for recipe_id, similar in top_similar.items()
+                for similar_id, score in similar
+            ),
+            batch_size=1000,
+        )
+
+
+def get_affected_recipes(recipe_ids, matrix, changed_ids):
+    # Кроме самих изменённых рецептов пересчитываются те, у кого они уже
+    # в списке, и те, в чей список они теперь проходят по сходству.
+    # Удалённые рецепты в матрицу не попали.
+    changed_ids = np.intersect1d(recipe_ids, changed_ids).tolist()
+    affected = set(changed_ids)
+    affected.update(
+        SimilarRecipe.objects.filter(similar_id__in=changed_ids).values_list(
+            'recipe_id', flat=True
+        )
+    )
+    if not changed_ids:
+        return affected
+    best = get_similarity_rows(
+        recipe_ids, matrix, changed_ids
+    ).max(axis=0).tocoo()
+    candidates = dict(zip(recipe_ids[best.col].tolist(), best.data.tolist()))
+    thresholds = {
+        recipe_id: (count, min_score)
+        for recipe_id, count, min_score in SimilarRecipe.objects.filter(
+            recipe_id__in=candidates
+        ).order_by().values_list('recipe_id').annotate(
+            count=Count('pk'), min_score=Min('score')
+        )
+    }
+    for recipe_id, score in candidates.items():
+        count, min_score = thresholds.get(recipe_id, (0, 0))
+        if count < settings.SIMILAR_RECIPES_COUNT or score > min_score:
+            affected.add(recipe_id)
+    return affected
+
+
+def mark_similar_outdated(*recipe_ids):
+    Recipe.objects.filter(pk__in=recipe_ids).update(similar_outdated=True)
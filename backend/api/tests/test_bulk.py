@@ -0,0 +1,84 @@
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Recipe, RecipeRanking
+from .utils import create_recipe, create_user, test_settings
+
+URL = '/api/recipes/favorite/bulk/'
+
+
+@test_settings
+class BulkFavoriteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        author = create_user('author')
+        cls.recipes = [
+            create_recipe(author, name=f'Рецепт {index}')
+            for index in range(3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def statuses(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {
+            result['id']: result['status']
+            for result in response.data['results']
+        }
+
+    def test_add(self):
+        first, second, third = self.recipes
+        missing_id = third.id + 100
+        Favorite.objects.create(user=self.user, recipe=first)
+        response = self.client.post(
+            URL, {'recipes': [first.id, second.id, missing_id]}, format='json'
+        )
+        self.assertEqual(
+            self.statuses(response),
+            {
+                first.id: 'exists',
+                second.id: 'created',
+                missing_id: 'not_found',
+            },
+        )
+        self.assertEqual(
+            set(self.user.favorites.values_list('recipe_id', flat=True)),
+            {first.id, second.id},
+        )
+        # Счётчик и рейтинг меняются только у действительно добавленного.
+        self.assertEqual(
+            dict(Recipe.objects.values_list('id', 'favorites_count')),
+            {first.id: 0, second.id: 1, third.id: 0},
+        )
+        self.assertEqual(
+            set(RecipeRanking.objects.filter(
+                score__isnull=False
+            ).values_list('recipe_id', flat=True)),
+            {second.id},
+        )
+
+    def test_remove(self):
+        first, second, third = self.recipes
+        Favorite.objects.create(user=self.user, recipe=first)
+        Favorite.objects.create(user=self.user, recipe=third)
+        Recipe.objects.update(favorites_count=1)
+        response = self.client.delete(
+            URL, {'recipes': [first.id, second.id]}, format='json'
+        )
+        self.assertEqual(
+            self.statuses(response),
+            {first.id: 'deleted', second.id: 'not_found'},
+        )
+        self.assertEqual(
+            list(self.user.favorites.values_list('recipe_id', flat=True)),
+            [third.id],
+        )
+        self.assertEqual(
+            dict(Recipe.objects.values_list('id', 'favorites_count')),
+            {first.id: 0, second.id: 1, third.id: 1},
+        )
@@ -0,0 +1,84 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Tag
+from .utils import clear_caches, create_recipe, create_user, test_settings
+
+
+@test_settings
+class CookTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.author = create_user('author')
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        self.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {index}', measurement_unit='г'
+            )
+            for index in range(4)
+        ]
+        first, second, third, fourth = self.ingredients
+        self.recipes = [
+            create_recipe(self.author, name='Всё есть',
+                          ingredients=(first, second)),
+            create_recipe(self.author, name='Не хватает одного',
+                          ingredients=(first, second, third)),
+            create_recipe(self.author, name='Не хватает двух',
+                          ingredients=(first, third, fourth)),
+        ]
+
+    def cook(self, *ingredients, max_missing=1):
+        response = self.client.get('/api/recipes/cook/', {
+            'ingredients': ','.join(
+                str(ingredient.id) for ingredient in ingredients
+            ),
+            'max_missing': max_missing,
+        })
+        self.assertEqual(response.status_code, 200)
+        return [
+            (recipe['name'], recipe['missing_ingredients'])
+            for recipe in response.data['results']
+        ]
+
+    def test_order_by_missing(self):
+        first, second, third, fourth = self.ingredients
+        self.assertEqual(
+            self.cook(first, second),
+            [('Всё есть', 0), ('Не хватает одного', 1)],
+        )
+
+    def test_recipe_update(self):
+        # Изменённый состав попадает в индекс без полной перестройки.
+        first, second, third, fourth = self.ingredients
+        self.cook(first, second)
+        recipe = self.recipes[2]
+        tag = Tag.objects.create(name='Ужин', slug='dinner')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/recipes/{recipe.id}/',
+                {
+                    'name': recipe.name,
+                    'text': recipe.text,
+                    'cooking_time': recipe.cooking_time,
+                    'tags': [tag.id],
+                    'ingredients': [{'id': first.id, 'amount': 1}],
+                },
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            self.cook(first, second),
+            [
+                ('Всё есть', 0),
+                ('Не хватает двух', 0),
+                ('Не хватает одного', 1),
+            ],
+        )
+
+    def test_validation(self):
+        response = self.client.get(
+            '/api/recipes/cook/', {'ingredients': 'x'}
+        )
+        self.assertEqual(response.status_code, 400)
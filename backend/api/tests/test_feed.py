@@ -0,0 +1,86 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import FeedEntry
+
+from .utils import create_recipe, create_user, test_settings
+
+
+@test_settings
+class FeedTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.author = create_user('author')
+        cls.other = create_user('other')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_feed(self, url='/api/recipes/feed/'):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def get_names(self, url='/api/recipes/feed/'):
+        return [recipe['name'] for recipe in self.get_feed(url)['results']]
+
+    def test_subscribe_and_publish(self):
+        create_recipe(self.author, name='Старый')
+        create_recipe(self.other, name='Чужой')
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        with self.captureOnCommitCallbacks(execute=True):
+            create_recipe(self.author, name='Новый')
+        self.assertEqual(self.get_names(), ['Новый', 'Старый'])
+
+    def test_unsubscribe(self):
+        create_recipe(self.author)
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        self.client.delete(f'/api/users/{self.author.id}/subscribe/')
+        self.assertEqual(self.get_names(), [])
+
+    def test_pages(self):
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        for index in range(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                create_recipe(self.author, name=f'Рецепт {index}')
+        feed = self.get_feed('/api/recipes/feed/?limit=2')
+        self.assertEqual(
+            [recipe['name'] for recipe in feed['results']],
+            ['Рецепт 2', 'Рецепт 1'],
+        )
+        self.assertEqual(self.get_names(feed['next']), ['Рецепт 0'])
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_pulled_author(self):
+        # Рецепты автора с большим числом подписчиков подмешиваются при
+        # чтении ленты.
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        with self.captureOnCommitCallbacks(execute=True):
+            create_recipe(self.author, name='Новый')
+        self.assertEqual(self.get_names(), ['Новый'])
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_stale_subscribers_count(self):
+        # У объекта автора устаревшее число подписчиков (0), в базе — 1:
+        # рецепт не раскладывается по лентам.
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        with self.captureOnCommitCallbacks(execute=True):
+            create_recipe(self.author)
+        self.assertFalse(FeedEntry.objects.exists())
+
+    @override_settings(FEED_TIMELINE_SIZE=2)
+    def test_trim_on_publish(self):
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        recipes = []
+        for index in range(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                recipes.append(create_recipe(self.author))
+        self.assertEqual(
+            list(FeedEntry.objects.filter(user=self.user).order_by(
+                'recipe_id'
+            ).values_list('recipe_id', flat=True)),
+            [recipe.id for recipe in recipes[1:]],
+        )
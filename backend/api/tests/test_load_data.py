@@ -0,0 +1,79 @@
+import json
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from django.core.management import call_command
+from django.test import TransactionTestCase
+
+from recipes.models import Ingredient
+from .utils import test_settings
+
+ROWS = [
+    ['Мука', 'г'],
+    ['Молоко', 'мл'],
+    ['Мука', 'г'],
+    ['', 'г'],
+]
+
+
+@test_settings
+class LoadDataTests(TransactionTestCase):
+    # Каждый пакет фиксируется отдельно, поэтому нужны настоящие
+    # транзакции.
+
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        Ingredient.objects.create(name='Молоко', measurement_unit='мл')
+
+    def load(self, name, content, *args):
+        path = self.directory / name
+        path.write_text(content, encoding='UTF-8')
+        output = StringIO()
+        call_command(
+            'load_data_csv', str(path), '--batch-size', '2', *args,
+            stdout=output,
+        )
+        return output.getvalue()
+
+    def assertLoaded(self, output):
+        self.assertIn('прочитано 4 записей', output)
+        self.assertIn('добавлено 1', output)
+        self.assertIn('уже были 2', output)
+        self.assertIn('пропущено 1', output)
+        self.assertEqual(
+            sorted(Ingredient.objects.values_list(
+                'name', 'measurement_unit'
+            )),
+            [('Молоко', 'мл'), ('Мука', 'г')],
+        )
+
+    def test_csv(self):
+        self.assertLoaded(self.load(
+            'ingredients.csv',
+            ''.join(f'{name},{unit}\n' for name, unit in ROWS),
+        ))
+
+    def test_json(self):
+        self.assertLoaded(self.load(
+            'ingredients.json',
+            json.dumps([
+                {'name': name, 'measurement_unit': unit}
+                for name, unit in ROWS
+            ]),
+        ))
+
+    def test_jsonl(self):
+        self.assertLoaded(self.load(
+            'ingredients.jsonl',
+            ''.join(f'{json.dumps(row)}\n' for row in ROWS),
+        ))
+
+    def test_copy(self):
+        self.assertLoaded(self.load(
+            'ingredients.csv',
+            ''.join(f'{name},{unit}\n' for name, unit in ROWS),
+            '--copy',
+        ))
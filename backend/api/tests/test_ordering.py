@@ -0,0 +1,57 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import RecipeRanking
+
+from .utils import clear_caches, create_recipe, create_user, test_settings
+
+
+@test_settings
+class RecipeOrderingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        cls.readers = [create_user(f'reader{index}') for index in range(3)]
+        cls.recipes = [
+            create_recipe(author, name=f'Рецепт {index}')
+            for index in range(3)
+        ]
+
+    def setUp(self):
+        clear_caches()
+
+    def add(self, relation, reader, recipe):
+        client = APIClient()
+        client.force_authenticate(reader)
+        response = client.post(f'/api/recipes/{recipe.id}/{relation}/')
+        self.assertEqual(response.status_code, 201)
+
+    def get_names(self, ordering):
+        response = APIClient().get(f'/api/recipes/?ordering={ordering}')
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def test_popular(self):
+        first, second, third = self.recipes
+        for reader in self.readers[:2]:
+            self.add('favorite', reader, first)
+        self.add('favorite', self.readers[0], third)
+        self.assertEqual(
+            self.get_names('popular'), ['Рецепт 0', 'Рецепт 2', 'Рецепт 1']
+        )
+
+    def test_trending(self):
+        # Добавление в корзину весит вдвое больше избранного.
+        first, second, third = self.recipes
+        self.add('favorite', self.readers[0], first)
+        self.add('shopping_cart', self.readers[0], second)
+        self.assertEqual(
+            self.get_names('trending')[:2], ['Рецепт 1', 'Рецепт 0']
+        )
+
+    def test_trending_without_ranking_row(self):
+        first, second, third = self.recipes
+        RecipeRanking.objects.filter(recipe=third).delete()
+        self.add('favorite', self.readers[0], third)
+        self.assertEqual(self.get_names('trending')[0], 'Рецепт 2')
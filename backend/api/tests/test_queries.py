@@ -0,0 +1,161 @@
+from base64 import b64encode
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.recipes_serializers import RecipeSerializer
+from recipes.models import Favorite, Ingredient, ShoppingCart, Tag
+from .utils import (
+    PNG,
+    clear_caches,
+    create_recipe,
+    create_user,
+    test_settings,
+)
+
+AUTHORS = 8
+RECIPES_PER_AUTHOR = 3
+
+
+@test_settings
+class QueryCountTests(TestCase):
+    # Число запросов не должно зависеть от размера страницы: связанные
+    # данные догружаются пакетно, а не по одному запросу на рецепт.
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.tags = tags = [
+            Tag.objects.create(name=f'Тег {index}', slug=f'tag-{index}')
+            for index in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {index}', measurement_unit='г'
+            )
+            for index in range(30)
+        ]
+        cls.authors = [
+            create_user(f'author{index}') for index in range(AUTHORS)
+        ]
+        for author in cls.authors:
+            for index in range(RECIPES_PER_AUTHOR):
+                recipe = create_recipe(
+                    author,
+                    name=f'Рецепт {author.username} {index}',
+                    tags=tags[:2],
+                    ingredients=cls.ingredients[index:index + 3],
+                )
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        cls.small_recipe = recipe
+        cls.large_recipe = create_recipe(
+            cls.authors[0],
+            name='Большой рецепт',
+            tags=tags,
+            ingredients=cls.ingredients,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for author in self.authors:
+            self.client.post(f'/api/users/{author.id}/subscribe/')
+
+    def capture_queries(self, url):
+        # Кеши сбрасываются, чтобы каждый запрос проходил полный путь.
+        clear_caches()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [query['sql'] for query in context.captured_queries]
+
+    def test_recipe_list_flags(self):
+        # Отметки избранного и корзины считаются в запросе страницы.
+        queries = self.capture_queries('/api/recipes/?limit=100')
+        for model in (Favorite, ShoppingCart):
+            with self.subTest(model=model.__name__):
+                self.assertEqual(
+                    sum(f'"{model._meta.db_table}"' in sql for sql in queries),
+                    1,
+                )
+
+    def count_queries(self, url):
+        return len(self.capture_queries(url))
+
+    def assertSameQueries(self, url):
+        self.assertEqual(
+            self.count_queries(url.format(limit=3)),
+            self.count_queries(url.format(limit=100)),
+        )
+
+    def test_recipe_list(self):
+        self.assertSameQueries('/api/recipes/?limit={limit}')
+
+    def test_recipe_list_query_count(self):
+        # Число рецептов, страница с авторами и отметками избранного
+        # и корзины, теги и ингредиенты всей страницы, подписки читателя.
+        clear_caches()
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/recipes/?limit=100')
+        self.assertEqual(
+            len(response.json()['results']), AUTHORS * RECIPES_PER_AUTHOR + 1
+        )
+
+    def test_recipe_retrieve(self):
+        self.assertEqual(
+            self.count_queries(f'/api/recipes/{self.small_recipe.id}/'),
+            self.count_queries(f'/api/recipes/{self.large_recipe.id}/'),
+        )
+
+    def test_subscriptions(self):
+        self.assertSameQueries(
+            '/api/users/subscriptions/?limit={limit}&recipes_limit={limit}'
+        )
+
+    def test_feed(self):
+        self.assertSameQueries('/api/recipes/feed/?limit={limit}')
+
+    def test_cook(self):
+        ingredient_ids = ','.join(
+            str(ingredient.id) for ingredient in self.ingredients
+        )
+        self.assertSameQueries(
+            f'/api/recipes/cook/?ingredients={ingredient_ids}'
+            '&limit={limit}'
+        )
+
+    def validate_recipe(self, tag_ids, ingredient_ids):
+        request = APIRequestFactory().post('/api/recipes/')
+        request.user = self.user
+        return RecipeSerializer(
+            data={
+                'name': 'Рецепт',
+                'text': 'Описание',
+                'cooking_time': 5,
+                'image': 'data:image/png;base64,' + b64encode(PNG).decode(),
+                'tags': tag_ids,
+                'ingredients': [
+                    {'id': ingredient_id, 'amount': 1}
+                    for ingredient_id in ingredient_ids
+                ],
+            },
+            context={'request': request},
+        )
+
+    def test_recipe_validation(self):
+        # Теги и ингредиенты находятся одним запросом на поле.
+        serializer = self.validate_recipe(
+            [tag.id for tag in self.tags],
+            [ingredient.id for ingredient in self.ingredients],
+        )
+        with self.assertNumQueries(2):
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+
+    def test_recipe_validation_reports_missing_ids(self):
+        serializer = self.validate_recipe([self.tags[0].id, 0], [0, -1])
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('tags', serializer.errors)
+        self.assertIn('ingredients', serializer.errors)
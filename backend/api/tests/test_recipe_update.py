@@ -0,0 +1,69 @@
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Tag
+from .utils import create_recipe, create_user, test_settings
+
+
+@test_settings
+class RecipeIngredientUpdateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('author')
+        cls.tag = Tag.objects.create(name='Обед', slug='lunch')
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {index}', measurement_unit='г'
+            )
+            for index in range(3)
+        ]
+        cls.recipe = create_recipe(
+            cls.user, tags=(cls.tag,), ingredients=cls.ingredients
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_rows(self):
+        return {
+            row.ingredient_id: (row.pk, row.amount)
+            for row in self.recipe.recipe_ingredients.all()
+        }
+
+    def patch(self, amounts):
+        response = self.client.patch(
+            f'/api/recipes/{self.recipe.id}/',
+            {
+                'name': 'Рецепт',
+                'text': 'Описание',
+                'cooking_time': 5,
+                'tags': [self.tag.id],
+                'ingredients': [
+                    {'id': ingredient.id, 'amount': amount}
+                    for ingredient, amount in zip(self.ingredients, amounts)
+                ],
+            },
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_same_ingredients_keep_rows(self):
+        rows = self.get_rows()
+        self.patch((1, 1, 1))
+        self.assertEqual(self.get_rows(), rows)
+
+    def test_changed_amount_updates_one_row(self):
+        rows = self.get_rows()
+        self.patch((1, 5, 1))
+        changed = self.ingredients[1].id
+        rows[changed] = (rows[changed][0], 5)
+        self.assertEqual(self.get_rows(), rows)
+
+    def test_removed_ingredient_deletes_its_row(self):
+        rows = self.get_rows()
+        self.patch((1, 1))
+        del rows[self.ingredients[2].id]
+        self.assertEqual(self.get_rows(), rows)
@@ -0,0 +1,89 @@
+from threading import Barrier, Thread
+
+from django.db import IntegrityError, connection
+from django.test import TransactionTestCase
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.serializers import FavoriteSerializer
+from recipes.models import Favorite, Recipe
+from .utils import create_recipe, create_user, test_settings
+
+THREADS = 8
+
+
+@test_settings
+class FavoriteRaceTests(TransactionTestCase):
+    # Настоящие транзакции: каждый поток работает в своём соединении.
+
+    def setUp(self):
+        self.user = create_user('user')
+        self.recipe = create_recipe(self.user)
+        self.url = f'/api/recipes/{self.recipe.id}/favorite/'
+
+    def _run_concurrently(self, method):
+        barrier = Barrier(THREADS)
+        statuses = []
+
+        def request():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                statuses.append(getattr(client, method)(self.url).status_code)
+            finally:
+                connection.close()
+
+        threads = [Thread(target=request) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(statuses)
+
+    def test_concurrent_add(self):
+        statuses = self._run_concurrently('post')
+        self.assertEqual(
+            statuses,
+            [status.HTTP_201_CREATED]
+            + [status.HTTP_400_BAD_REQUEST] * (THREADS - 1),
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+        self.assertEqual(Favorite.objects.count(), 1)
+
+    def test_concurrent_remove(self):
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        Recipe.objects.filter(pk=self.recipe.pk).update(favorites_count=1)
+        statuses = self._run_concurrently('delete')
+        self.assertEqual(
+            statuses,
+            [status.HTTP_204_NO_CONTENT]
+            + [status.HTTP_400_BAD_REQUEST] * (THREADS - 1),
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 0)
+        self.assertFalse(Favorite.objects.exists())
+
+    def test_deleted_recipe_is_not_reported_as_duplicate(self):
+        request = APIRequestFactory().post(self.url)
+        request.user = self.user
+        serializer = FavoriteSerializer(
+            data={}, context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+        Recipe.objects.filter(pk=self.recipe.pk).delete()
+        with self.assertRaises(IntegrityError):
+            serializer.save(recipe=self.recipe)
+
+    def test_duplicate_subscription(self):
+        author = create_user('author')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = f'/api/users/{author.id}/subscribe/'
+        self.assertEqual(
+            client.post(url).status_code, status.HTTP_201_CREATED
+        )
+        response = client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('subscribed_to', response.data)
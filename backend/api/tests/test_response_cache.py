@@ -0,0 +1,37 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite
+from .utils import clear_caches, create_recipe, create_user, test_settings
+
+
+@test_settings
+class ResponseCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.recipe = create_recipe(create_user('author'))
+        Favorite.objects.create(user=cls.user, recipe=cls.recipe)
+
+    def setUp(self):
+        clear_caches()
+        self.url = f'/api/recipes/{self.recipe.id}/'
+
+    def test_anonymous_response_is_cached(self):
+        APIClient().get(self.url)
+        with self.assertNumQueries(0):
+            response = APIClient().get(self.url)
+        self.assertFalse(response.json()['is_favorited'])
+
+    def test_authenticated_user_bypasses_cache(self):
+        # Пользователь без заголовка Authorization (например, вошедший
+        # через force_authenticate) не получает анонимный ответ из кеша.
+        APIClient().get(self.url)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertTrue(client.get(self.url).json()['is_favorited'])
+        # И не кладёт свой ответ в общий кеш.
+        clear_caches()
+        client.get(self.url)
+        self.assertFalse(APIClient().get(self.url).json()['is_favorited'])
@@ -0,0 +1,41 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient
+from .utils import clear_caches, create_recipe, create_user, test_settings
+
+
+@test_settings
+class RecipeSearchTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        author = create_user('author')
+        self.ingredient = Ingredient.objects.create(
+            name='Творог', measurement_unit='г'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            create_recipe(author, name='Борщ')
+            create_recipe(
+                author, name='Запеканка', ingredients=(self.ingredient,)
+            )
+            create_recipe(author, name='Сырники с творогом')
+
+    def search(self, query):
+        response = APIClient().get('/api/recipes/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def test_name_ranks_above_ingredients(self):
+        self.assertEqual(
+            self.search('творог'), ['Сырники с творогом', 'Запеканка']
+        )
+
+    def test_no_match(self):
+        self.assertEqual(self.search('пицца'), [])
+
+    def test_ingredient_rename(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingredient.name = 'Малина'
+            self.ingredient.save()
+        self.assertEqual(self.search('малина'), ['Запеканка'])
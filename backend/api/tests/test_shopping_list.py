@@ -0,0 +1,60 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, RecipeIng, ShoppingCart
+from .utils import clear_caches, create_recipe, create_user, test_settings
+
+
+@test_settings
+class ShoppingListInvalidationTests(TestCase):
+    # Изменения в обход API тоже сбрасывают сохранённый список.
+
+    def setUp(self):
+        clear_caches()
+        self.user = create_user('buyer')
+        self.author = create_user('author')
+        self.ingredient = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+        self.recipe = create_recipe(
+            self.author, name='Блины', ingredients=(self.ingredient,)
+        )
+        ShoppingCart.objects.create(user=self.user, recipe=self.recipe)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, export_format='csv'):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/',
+            {'format': export_format},
+        )
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ingredient_rename(self):
+        self.assertIn('мука,1,г', self.download())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingredient.name = 'мука пшеничная'
+            self.ingredient.save()
+        self.assertIn('мука пшеничная,1,г', self.download())
+
+    def test_amount_change(self):
+        self.assertIn('мука,1,г', self.download())
+        with self.captureOnCommitCallbacks(execute=True):
+            row = RecipeIng.objects.get(recipe=self.recipe)
+            row.amount = 300
+            row.save()
+        self.assertIn('мука,300,г', self.download())
+
+    def test_recipe_delete(self):
+        self.assertIn('мука', self.download())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+        self.assertNotIn('мука', self.download())
+
+    def test_author_delete(self):
+        self.assertIn('Блины', self.download('txt'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.delete()
+        self.assertNotIn('Блины', self.download('txt'))
+        self.assertIn('Всего рецептов: 0', self.download('txt'))
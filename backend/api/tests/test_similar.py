@@ -0,0 +1,76 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, SimilarRecipe, Tag
+from .utils import clear_caches, create_recipe, create_user, test_settings
+
+
+@test_settings
+class SimilarRecipesTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.author = create_user('author')
+        self.tags = [
+            Tag.objects.create(name=f'Тег {index}', slug=f'tag-{index}')
+            for index in range(2)
+        ]
+        self.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {index}', measurement_unit='г'
+            )
+            for index in range(8)
+        ]
+        self.recipe = self.create_recipe('Исходный', 0, 0, 1, 2)
+        self.create_recipe('Почти такой же', 0, 0, 1, 3)
+        self.create_recipe('Немного похожий', 0, 0, 4, 5)
+        self.create_recipe('Другой', 1, 6, 7)
+        self.compute()
+
+    def create_recipe(self, name, tag, *ingredients):
+        return create_recipe(
+            self.author,
+            name=name,
+            tags=(self.tags[tag],),
+            ingredients=[self.ingredients[index] for index in ingredients],
+        )
+
+    @staticmethod
+    def compute(*args):
+        call_command('compute_similar_recipes', *args, stdout=StringIO())
+
+    @staticmethod
+    def get_stored():
+        return sorted(SimilarRecipe.objects.values_list(
+            'recipe_id', 'similar_id', 'score'
+        ))
+
+    def test_overlap_ranks_higher(self):
+        response = APIClient().get(f'/api/recipes/{self.recipe.id}/similar/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe['name'] for recipe in response.data],
+            ['Почти такой же', 'Немного похожий'],
+        )
+        self.assertGreater(
+            response.data[0]['score'], response.data[1]['score']
+        )
+
+    def test_unknown_recipe(self):
+        response = APIClient().get(
+            f'/api/recipes/{self.recipe.id + 1000}/similar/'
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_outdated_matches_full_run(self):
+        recipe = self.create_recipe('Новый', 0, 0, 1, 2, 6)
+        self.compute('--outdated')
+        stored = self.get_stored()
+        self.assertTrue(SimilarRecipe.objects.filter(
+            recipe=self.recipe, similar=recipe
+        ).exists())
+        self.compute()
+        self.assertEqual(stored, self.get_stored())
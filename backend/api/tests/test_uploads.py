@@ -0,0 +1,100 @@
+import json
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Tag
+from .utils import PNG, create_user, test_settings
+
+
+def upload(name='image.png', content=PNG):
+    return SimpleUploadedFile(name, content, content_type='image/png')
+
+
+@test_settings
+class MultipartUploadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('author')
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.ingredient = Ingredient.objects.create(
+            name='Мука', measurement_unit='г'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def recipe_data(self, **data):
+        return {
+            'name': 'Блины',
+            'text': 'Описание',
+            'cooking_time': 20,
+            'tags': [self.tag.id],
+            'ingredients': json.dumps(
+                [{'id': self.ingredient.id, 'amount': 200}]
+            ),
+            'image': upload(),
+            **data,
+        }
+
+    def test_create_recipe(self):
+        response = self.client.post(
+            '/api/recipes/', self.recipe_data(), format='multipart'
+        )
+        self.assertEqual(
+            response.status_code, status.HTTP_201_CREATED, response.data
+        )
+        recipe = Recipe.objects.get(pk=response.data['id'])
+        self.assertTrue(recipe.image.name.endswith('.png'))
+        self.assertEqual(list(recipe.tags.all()), [self.tag])
+        self.assertEqual(
+            list(recipe.recipe_ingredients.values_list(
+                'ingredient_id', 'amount'
+            )),
+            [(self.ingredient.id, 200)],
+        )
+
+    def test_create_recipe_with_invalid_ingredients(self):
+        response = self.client.post(
+            '/api/recipes/',
+            self.recipe_data(ingredients='[{'),
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ingredients', response.data)
+
+    def test_create_recipe_rejects_non_image(self):
+        response = self.client.post(
+            '/api/recipes/',
+            self.recipe_data(image=upload(content=b'not an image')),
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', response.data)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_upload_avatar(self):
+        response = self.client.put(
+            '/api/users/me/avatar/',
+            {'avatar': upload('avatar.png')},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.avatar.name.endswith('.png'))
+        self.assertTrue(response.data['avatar'].endswith(self.user.avatar.url))
+
+    def test_upload_avatar_rejects_non_image(self):
+        response = self.client.put(
+            '/api/users/me/avatar/',
+            {'avatar': upload('avatar.png', b'not an image')},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('avatar', response.data)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.avatar)
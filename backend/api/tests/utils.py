@@ -0,0 +1,54 @@
+from base64 import b64decode
+from tempfile import mkdtemp
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import override_settings
+
+from api.recipe_fragments import local_fragments
+from recipes.models import Recipe
+from users.models import User
+
+PNG = b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAQMAAAAl21bKAAAAA1BMVEUAAACnej3aAAAAAX'
+    'RSTlMAQObYZgAAAApJREFUCNdjYAAAAAIAAeIhvDMAAAAASUVORK5CYII='
+)
+
+# Локальный кеш вместо Redis, изображения — во временный каталог и
+# обрабатываются сразу, а не в фоновом потоке.
+test_settings = override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    },
+    MEDIA_ROOT=mkdtemp(),
+    IMAGE_PROCESSING_SYNC=True,
+)
+
+
+def clear_caches():
+    cache.clear()
+    local_fragments.clear()
+
+
+def create_user(username):
+    return User.objects.create_user(
+        email=f'{username}@example.com',
+        username=username,
+        first_name='Имя',
+        last_name='Фамилия',
+        password='password',
+    )
+
+
+def create_recipe(author, name='Рецепт', tags=(), ingredients=()):
+    recipe = Recipe(
+        author=author, name=name, text='Описание', cooking_time=5
+    )
+    recipe.image.save('recipe.png', ContentFile(PNG), save=False)
+    recipe.save()
+    recipe.tags.set(tags)
+    for ingredient in ingredients:
+        recipe.ingredients.add(ingredient, through_defaults={'amount': 1})
+    return recipe
@@ -1,32 +1,35 @@
 from rest_framework import permissions, status
 from djoser.views import UserViewSet as DjoserUserViewSet
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models.functions import Lower
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import Lower, RowNumber
 from rest_framework.viewsets import ReadOnlyModelViewSet
 from django_filters.rest_framework import DjangoFilterBackend
 
-from .paginations import Pagination
+from .paginations import KeysetPaginationMixin, Pagination
 from .serializers import (
     UserSerializer, AvatarSerializer, IngSerializer,
     TagSerializer, UserSubSerializer, SubscriptionDeleteSerializer,
     AvatarDeleteSerializer
 )
-from recipes.models import Tag, Ingredient
+from recipes.models import Tag, Ingredient, Recipe
 from .filters import IngFilter
-from users.models import Sub
+from .ingredient_index import ingredient_index
+from .response_cache import AnonymousResponseCacheMixin
 
 User = get_user_model()
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(AnonymousResponseCacheMixin, ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
 
 
-class IngViewSet(ReadOnlyModelViewSet):
+class IngViewSet(AnonymousResponseCacheMixin, ReadOnlyModelViewSet):
     pagination_class = None
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngFilter
@@ -35,9 +38,18 @@ class IngViewSet(ReadOnlyModelViewSet):
     )
     serializer_class = IngSerializer
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        return Response(
+            ingredient_index.search(name, settings.INGREDIENT_SEARCH_LIMIT)
+        )
+
 
-class UserViewSet(DjoserUserViewSet):
+class UserViewSet(KeysetPaginationMixin, DjoserUserViewSet):
     pagination_class = Pagination
+    keyset_ordering = ('email',)
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -116,9 +128,7 @@ class UserViewSet(DjoserUserViewSet):
         )
 
         serializer.is_valid(raise_exception=True)
-
-        subscription = Sub(user=user, subscribed_to=author)
-        subscription.save()
+        serializer.create_subscription(author)
 
         data = UserSubSerializer(
             author, context={'request': request}
@@ -134,10 +144,7 @@ class UserViewSet(DjoserUserViewSet):
             }
         )
         serializer.is_valid(raise_exception=True)
-
-        deleted_count, _ = user.subscriptions.filter(
-            subscribed_to=author
-        ).delete()
+        serializer.delete_subscription(author)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -148,7 +155,23 @@ class UserViewSet(DjoserUserViewSet):
         url_path='subscriptions',
     )
     def subscriptions(self, request, *args, **kwargs):
-        queryset = User.objects.filter(subscribers__user=request.user)
+        recipes = Recipe.objects.all()
+        limit = UserSubSerializer.get_recipes_limit(request)
+        if limit is not None:
+            recipes = recipes.annotate(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=F('author_id'),
+                    order_by=(F('name').asc(), F('id').asc()),
+                )
+            ).filter(row_number__lte=limit)
+        queryset = User.objects.filter(
+            subscribers__user=request.user
+        ).order_by(
+            *User._meta.ordering
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='recipes_preview')
+        )
         pages = self.paginate_queryset(queryset)
         serializer = UserSubSerializer(
             pages, many=True, context={'request': request}
@@ -11,7 +11,7 @@ DEBUG = config('DEBUG', default=False, cast=bool)
 ALLOWED_HOSTS = ('*',)
 DATA_UPLOAD_MAX_MEMORY_SIZE = 20 * 1024 * 1024
 
-FILE_UPLOAD_MAX_MEMORY_SIZE = 20 * 1024 * 1024
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2 * 1024 * 1024
 
 AUTH_USER_MODEL = 'users.User'
 
@@ -24,6 +24,7 @@ INSTALLED_APPS = (
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'recipes.apps.RecipesConfig',
     'api.apps.ApiConfig',
     'users.apps.UsersConfig',
@@ -73,6 +74,14 @@ DATABASES = {
     },
 }
 
+# Общий кеш нужен для версий и данных, которые делят процессы gunicorn.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('REDIS_URL', default='redis://redis:6379/0'),
+    },
+}
+
 AUTHENTICATION_BACKENDS = (
     'django.contrib.auth.backends.ModelBackend',
 )
@@ -144,3 +153,56 @@ MEDIA_ROOT = 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CSRF_TRUSTED_ORIGINS = ('https://*',)
+
+INGREDIENT_SEARCH_LIMIT = 50
+
+PAGINATION_COUNT_CACHE_TIMEOUT = 60
+
+RESPONSE_CACHE_TIMEOUT = 24 * 60 * 60
+
+RECIPE_FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+
+RECIPE_FRAGMENT_LRU_SIZE = 1000
+
+IMAGE_PROCESSING_SYNC = config(
+    'IMAGE_PROCESSING_SYNC', default=False, cast=bool
+)
+
+IMAGE_PROCESSING_WORKERS = config(
+    'IMAGE_PROCESSING_WORKERS', default=2, cast=int
+)
+
+IMAGE_VARIANT_FORMAT = 'WEBP'
+
+IMAGE_VARIANT_QUALITY = 80
+
+IMAGE_VARIANT_SIZES = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+
+SHOPPING_LIST_CACHE_TIMEOUT = 24 * 60 * 60
+
+SHOPPING_LIST_PDF_FONT = config(
+    'SHOPPING_LIST_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+)
+
+RECIPE_TRENDING_HALF_LIFE_HOURS = 72
+
+FEED_TIMELINE_SIZE = 500
+
+FEED_FANOUT_LIMIT = 10_000
+
+RECIPE_SEARCH_CONFIG = 'russian'
+
+COOK_MAX_INGREDIENTS = 100
+
+COOK_MAX_MISSING = 5
+
+SIMILAR_RECIPES_COUNT = 10
+
+SIMILAR_RECIPES_TAG_WEIGHT = 0.5
+
+SIMILAR_RECIPES_MAX_FREQUENCY = 10_000
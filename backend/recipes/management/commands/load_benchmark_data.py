@@ -0,0 +1,163 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.ranking import get_event_score
+from recipes.models import Favorite, Recipe, RecipeRanking, Tag
+
+User = get_user_model()
+
+BENCH_PREFIX = 'bench_'
+BENCH_TAGS = (
+    ('Завтрак', 'breakfast'),
+    ('Обед', 'lunch'),
+    ('Ужин', 'dinner'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Генерация данных для нагрузочных замеров (только PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--recipes', type=int, default=1_000_000)
+        parser.add_argument('--favorites', type=int, default=10_000_000)
+        parser.add_argument('--batch-size', type=int, default=500_000)
+
+    def _run_batches(self, title, total, batch_size, sql, params=()):
+        for start in range(1, total + 1, batch_size):
+            stop = min(start + batch_size - 1, total)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, (*params, start, stop))
+            self.stdout.write(f'{title}: {stop}/{total}')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Команда поддерживает только PostgreSQL')
+
+        batch_size = options['batch_size']
+        users = User._meta.db_table
+        recipes = Recipe._meta.db_table
+        favorites = Favorite._meta.db_table
+        recipe_tags = Recipe.tags.through._meta.db_table
+
+        for name, slug in BENCH_TAGS:
+            Tag.objects.get_or_create(slug=slug, defaults={'name': name})
+
+        self._run_batches(
+            'Пользователи', options['users'], batch_size,
+            f'''
+            INSERT INTO {users} (
+                password, is_superuser, username, first_name, last_name,
+                email, is_staff, is_active, date_joined, avatar,
+                avatar_variants, recipes_count, subscribers_count
+            )
+            SELECT '!', false, %s || g, 'Bench', 'User',
+                   %s || g || '@example.com', false, true, now(), '',
+                   '{{}}', 0, 0
+            FROM generate_series(%s, %s) AS g
+            ON CONFLICT DO NOTHING
+            ''',
+            (BENCH_PREFIX, BENCH_PREFIX),
+        )
+        self._run_batches(
+            'Рецепты', options['recipes'], batch_size,
+            f'''
+            WITH authors AS (
+                SELECT array_agg(id) AS ids FROM {users}
+                WHERE username LIKE %s
+            )
+            INSERT INTO {recipes} (
+                author_id, name, text, image, cooking_time, image_variants,
+                favorites_count, in_carts_count, similar_outdated
+            )
+            SELECT ids[1 + floor(random() * array_length(ids, 1))::int],
+                   %s || g, 'Описание', 'recipes/images/bench.png',
+                   1 + floor(random() * 120)::int, '{{}}', 0, 0, true
+            FROM authors, generate_series(%s, %s) AS g
+            ''',
+            (f'{BENCH_PREFIX}%', BENCH_PREFIX),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'''
+                INSERT INTO {recipe_tags} (recipe_id, tag_id)
+                SELECT r.id, t.id
+                FROM {recipes} AS r
+                JOIN {Tag._meta.db_table} AS t ON t.slug = ANY(%s)
+                WHERE r.name LIKE %s AND random() < 0.5
+                ON CONFLICT DO NOTHING
+                ''',
+                ([slug for _, slug in BENCH_TAGS], f'{BENCH_PREFIX}%'),
+            )
+        self._run_batches(
+            'Избранное', options['favorites'], batch_size,
+            f'''
+            WITH users AS (
+                SELECT array_agg(id) AS ids FROM {users}
+                WHERE username LIKE %s
+            ), recipes AS (
+                SELECT array_agg(id) AS ids FROM {recipes}
+                WHERE name LIKE %s
+            )
+            INSERT INTO {favorites} (user_id, recipe_id)
+            SELECT users.ids[
+                       1 + floor(random() * array_length(users.ids, 1))::int
+                   ],
+                   recipes.ids[
+                       1 + floor(random() * array_length(recipes.ids, 1))::int
+                   ]
+            FROM users, recipes, generate_series(%s, %s)
+            ON CONFLICT DO NOTHING
+            ''',
+            (f'{BENCH_PREFIX}%', f'{BENCH_PREFIX}%'),
+        )
+        rankings = RecipeRanking._meta.db_table
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Счётчики и рейтинг пересчитываются одним проходом,
+            # время добавления в избранное разбрасывается на 30 суток.
+            cursor.execute(
+                f'''
+                UPDATE {recipes} AS r SET favorites_count = f.count
+                FROM (
+                    SELECT recipe_id, count(*) AS count FROM {favorites}
+                    GROUP BY recipe_id
+                ) AS f
+                WHERE r.id = f.recipe_id
+                '''
+            )
+            cursor.execute(
+                f'''
+                UPDATE {users} AS u SET recipes_count = r.count
+                FROM (
+                    SELECT author_id, count(*) AS count FROM {recipes}
+                    GROUP BY author_id
+                ) AS r
+                WHERE u.id = r.author_id
+                '''
+            )
+            cursor.execute(
+                f'''
+                INSERT INTO {rankings} (recipe_id, score)
+                SELECT id, CASE WHEN favorites_count > 0
+                    THEN %s + ln(favorites_count) - %s * random()
+                    END
+                FROM {recipes}
+                WHERE name LIKE %s
+                ON CONFLICT DO NOTHING
+                ''',
+                (
+                    get_event_score(1.0),
+                    get_event_score(1.0) - get_event_score(
+                        1.0, timezone.now() - timedelta(days=30)
+                    ),
+                    f'{BENCH_PREFIX}%',
+                ),
+            )
+        with connection.cursor() as cursor:
+            for table in (users, recipes, recipe_tags, favorites, rankings):
+                cursor.execute(f'ANALYZE {table}')
+        self.stdout.write(self.style.SUCCESS('Данные для замеров загружены'))
@@ -1,46 +1,192 @@
+import json
 from csv import reader as csv_reader
+from csv import writer as csv_writer
+from io import StringIO
+from itertools import islice
+from pathlib import Path
+from time import perf_counter
 
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from api.ingredient_index import ingredient_index
+from api.response_cache import invalidate_response_cache
 from recipes.models import Ingredient
 
+FORMATS = {
+    '.csv': 'csv',
+    '.json': 'json',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+}
+HEADER = ['name', 'measurement_unit']
+STAGING_TABLE = 'ingredient_staging'
+READ_CHUNK_SIZE = 64 * 1024
 
-class Command(BaseCommand):
-    help_text = 'Загрузка списка ингредиентов'
 
-    def execute_command(self):
-        p = 'data/ingredients.csv'
+def iter_json_array(file, chunk_size=READ_CHUNK_SIZE):
+    # Элементы JSON-массива разбираются по мере чтения файла, без
+    # загрузки всего документа в память.
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if not started and position < len(buffer):
+            if buffer[position] != '[':
+                raise ValueError('Ожидается JSON-массив')
+            started = True
+            position += 1
+            continue
+        if started and position < len(buffer) and buffer[position] == ']':
+            return
         try:
-            with open(p, mode='r', encoding='UTF-8') as file:
-                food_items = self._prepare_food_items(file)
-                saved_count = self._save_to_database(food_items)
+            item, end = decoder.raw_decode(buffer, position)
+            # Число на границе блока могло прочитаться не полностью.
+            if end == len(buffer) and not eof:
+                raise json.JSONDecodeError('', buffer, end)
+        except json.JSONDecodeError:
+            if eof:
+                raise ValueError('Некорректный JSON-массив') from None
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+        position = end
 
-                self._show_success_message(saved_count, p)
 
-        except FileNotFoundError:
-            self._show_error_message(f'Отсутствует файл данных: {p}')
-        except Exception as error:
-            self._show_error_message(f'Произошла ошибка: {error}')
+class Command(BaseCommand):
+    help = (
+        'Загрузка списка ингредиентов из CSV, JSON или JSONL: файл '
+        'читается потоково, записи добавляются пакетами, существующие '
+        'пропускаются'
+    )
 
-    def _prepare_food_items(self, file_object):
-        return [
-            Ingredient(
-                name=row[0].strip(),
-                measurement_unit=row[1].strip()
-            )
-            for row in csv_reader(file_object)
-        ]
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='data/ingredients.csv'
+        )
+        parser.add_argument('--format', choices=sorted(set(FORMATS.values())))
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='Загружать пакеты через COPY во временную таблицу '
+                 '(только PostgreSQL)',
+        )
+
+    def _read_rows(self, file, file_format):
+        if file_format == 'csv':
+            for row in csv_reader(file):
+                if row != HEADER:
+                    yield row
+        elif file_format == 'jsonl':
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from iter_json_array(file)
+
+    def _prepare_food_items(self, rows):
+        # Неполные и слишком длинные записи пропускаются.
+        name_length = Ingredient._meta.get_field('name').max_length
+        unit_length = Ingredient._meta.get_field(
+            'measurement_unit'
+        ).max_length
+        for row in rows:
+            if isinstance(row, dict):
+                row = (row.get('name'), row.get('measurement_unit'))
+            if not isinstance(row, (list, tuple)) or len(row) != 2 or not all(
+                isinstance(value, str) for value in row
+            ):
+                yield None
+                continue
+            name, unit = (value.strip() for value in row)
+            if (
+                not name or not unit
+                or len(name) > name_length or len(unit) > unit_length
+            ):
+                yield None
+                continue
+            yield name, unit
+
+    def _insert_batch(self, cursor, items):
+        table = Ingredient._meta.db_table
+        cursor.execute(
+            f'''
+            INSERT INTO {table} (name, measurement_unit)
+            VALUES {', '.join(['(%s, %s)'] * len(items))}
+            ON CONFLICT (name, measurement_unit) DO NOTHING
+            RETURNING id
+            ''',
+            [value for item in items for value in item],
+        )
+        return len(cursor.fetchall())
+
+    def _copy_batch(self, cursor, items):
+        buffer = StringIO()
+        csv_writer(buffer).writerows(items)
+        buffer.seek(0)
+        cursor.copy_expert(
+            f'COPY {STAGING_TABLE} (name, measurement_unit) '
+            'FROM STDIN WITH (FORMAT csv)',
+            buffer,
+        )
+        cursor.execute(
+            f'''
+            INSERT INTO {Ingredient._meta.db_table} (name, measurement_unit)
+            SELECT name, measurement_unit FROM {STAGING_TABLE}
+            ON CONFLICT (name, measurement_unit) DO NOTHING
+            RETURNING id
+            '''
+        )
+        return len(cursor.fetchall())
 
-    def _save_to_database(self, items):
-        return len(Ingredient.objects.bulk_create(
-            items,
-            ignore_conflicts=True
-        ))
+    def _save_to_database(self, food_items, counts, batch_size, use_copy):
+        # Каждый пакет фиксируется отдельно: длинная загрузка не держит
+        # одну транзакцию, а прерванную можно просто запустить снова.
+        save_batch = self._copy_batch if use_copy else self._insert_batch
+        with connection.cursor() as cursor:
+            if use_copy:
+                cursor.execute(
+                    f'CREATE TEMP TABLE {STAGING_TABLE} '
+                    '(name varchar(128), measurement_unit varchar(64)) '
+                    'ON COMMIT DELETE ROWS'
+                )
+            try:
+                while True:
+                    batch = list(islice(food_items, batch_size))
+                    if not batch:
+                        break
+                    counts['read'] += len(batch)
+                    items = list(dict.fromkeys(
+                        item for item in batch if item is not None
+                    ))
+                    counts['skipped'] += len(batch) - len(items)
+                    if not items:
+                        continue
+                    with transaction.atomic():
+                        inserted = save_batch(cursor, items)
+                    counts['inserted'] += inserted
+                    counts['existing'] += len(items) - inserted
+            finally:
+                if use_copy:
+                    cursor.execute(f'DROP TABLE IF EXISTS {STAGING_TABLE}')
 
-    def _show_success_message(self, count, path):
+    def _show_success_message(self, counts, path, seconds):
         self.stdout.write(
             self.style.SUCCESS(
-                f'Загружено {count} записей из файла {path}'
+                f'Файл {path}: прочитано {counts["read"]} записей, '
+                f'добавлено {counts["inserted"]}, '
+                f'уже были {counts["existing"]}, '
+                f'пропущено {counts["skipped"]} '
+                f'за {seconds:.2f} с '
+                f'({counts["read"] / max(seconds, 1e-9):.0f} записей/с)'
             )
         )
 
@@ -50,4 +196,38 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
-        self.execute_command()
+        path = options['path']
+        file_format = options['format'] or FORMATS.get(
+            Path(path).suffix.lower()
+        )
+        if file_format is None:
+            raise CommandError(
+                f'Неизвестный формат файла {path}, укажите --format'
+            )
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy поддерживается только в PostgreSQL')
+        counts = {'read': 0, 'inserted': 0, 'existing': 0, 'skipped': 0}
+        started = perf_counter()
+        try:
+            with open(path, mode='r', encoding='UTF-8') as file:
+                self._save_to_database(
+                    self._prepare_food_items(
+                        self._read_rows(file, file_format)
+                    ),
+                    counts,
+                    options['batch_size'],
+                    options['copy'],
+                )
+        except FileNotFoundError:
+            self._show_error_message(f'Отсутствует файл данных: {path}')
+        except Exception as error:
+            self._show_error_message(f'Произошла ошибка: {error}')
+        else:
+            self._show_success_message(
+                counts, path, perf_counter() - started
+            )
+        finally:
+            if counts['inserted']:
+                # Пакетная вставка не вызывает сигналы модели.
+                ingredient_index.invalidate()
+                invalidate_response_cache()
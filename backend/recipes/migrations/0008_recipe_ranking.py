@@ -0,0 +1,68 @@
+# Generated by Django 4.2 on 2026-10-18 04:50
+
+import math
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 10000
+
+
+def fill_rankings(apps, schema_editor):
+    # Время прежних добавлений неизвестно: они считаются текущими.
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeRanking = apps.get_model('recipes', 'RecipeRanking')
+    hours = (
+        datetime.now(timezone.utc) - datetime(2024, 1, 1, tzinfo=timezone.utc)
+    ).total_seconds() / 3600
+    now_score = hours / 72 * math.log(2)
+    recipes = Recipe.objects.order_by('pk').values_list(
+        'pk', 'favorites_count', 'in_carts_count'
+    )
+    last_pk = 0
+    while True:
+        batch = list(recipes.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+        RecipeRanking.objects.bulk_create(
+            RecipeRanking(
+                recipe_id=pk,
+                score=(
+                    now_score + math.log(favorites + 2 * in_carts)
+                    if favorites or in_carts else 0
+                ),
+            )
+            for pk, favorites, in_carts in batch
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_denormalized_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeRanking',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('score', models.FloatField(default=0, verbose_name='Рейтинг')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг рецепта',
+                'verbose_name_plural': 'Рейтинги рецептов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-id'], name='recipe_favorites_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reciperanking',
+            index=models.Index(fields=['-score', '-recipe'], name='reciperanking_score_idx'),
+        ),
+        migrations.RunPython(fill_rankings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-18 05:11
+
+from django.db import migrations, models
+
+
+def clear_empty_scores(apps, schema_editor):
+    # Раньше отсутствие событий хранилось как 0.
+    RecipeRanking = apps.get_model('recipes', 'RecipeRanking')
+    RecipeRanking.objects.filter(score=0).update(score=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_similar_recipes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reciperanking',
+            name='score',
+            field=models.FloatField(null=True, verbose_name='Рейтинг'),
+        ),
+        migrations.RunPython(clear_empty_scores, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models.functions import Lower, Upper
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.conf import settings
 
@@ -44,6 +47,17 @@ class Ingredient(models.Model):
                 name='unique_ingredient',
             ),
         )
+        indexes = (
+            models.Index(Lower('name'), name='ingredient_name_lower_idx'),
+            models.Index(
+                OpClass(Lower('name'), name='varchar_pattern_ops'),
+                name='ingredient_name_prefix_idx',
+            ),
+            GinIndex(
+                OpClass(Upper('name'), name='gin_trgm_ops'),
+                name='ingredient_name_trgm_idx',
+            ),
+        )
 
     def __str__(self):
         return f'{self.name}, {self.measurement_unit}'
@@ -67,6 +81,11 @@ class Recipe(models.Model):
         upload_to='recipes/images/',
         null=True,
     )
+    image_variants = models.JSONField(
+        verbose_name='Варианты изображения',
+        default=dict,
+        blank=True,
+    )
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name='Время приготовления',
         validators=(MinValueValidator(1),),
@@ -80,16 +99,85 @@ class Recipe(models.Model):
         Tag,
         verbose_name='Теги',
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+    similar_outdated = models.BooleanField(
+        verbose_name='Похожие рецепты устарели',
+        default=True,
+        editable=False,
+    )
+
+    DERIVED_FIELDS = (
+        'favorites_count',
+        'in_carts_count',
+        'search_vector',
+        'similar_outdated',
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('name',)
         default_related_name = 'recipes'
+        indexes = (
+            models.Index(fields=('name', 'id'), name='recipe_name_id_idx'),
+            models.Index(
+                fields=('-favorites_count', '-id'),
+                name='recipe_favorites_count_idx',
+            ),
+            models.Index(
+                fields=('author', 'name'),
+                name='recipe_author_name_idx',
+            ),
+            models.Index(
+                OpClass(Lower('name'), name='varchar_pattern_ops'),
+                name='recipe_name_prefix_idx',
+            ),
+            GinIndex(
+                OpClass(Upper('name'), name='gin_trgm_ops'),
+                name='recipe_name_trgm_idx',
+            ),
+            GinIndex(
+                fields=('search_vector',),
+                name='recipe_search_vector_idx',
+            ),
+            models.Index(
+                fields=('id',),
+                condition=models.Q(similar_outdated=True),
+                name='recipe_similar_outdated_idx',
+            ),
+        )
 
     def __str__(self):
         return f'{self.author}) {self.name}'
 
+    def save(self, *args, **kwargs):
+        # Счётчики и другие вычисляемые поля меняются только update(),
+        # поэтому обычное сохранение не перезаписывает их устаревшими
+        # значениями.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.DERIVED_FIELDS
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
 
 class RecipeIng(models.Model):
     recipe = models.ForeignKey(
@@ -144,6 +232,12 @@ class UserRecipeRelation(models.Model):
                 name='unique_%(class)s',
             ),
         ]
+        indexes = (
+            models.Index(
+                fields=('recipe', 'user'),
+                name='%(class)s_recipe_user_idx',
+            ),
+        )
 
 
 class Favorite(UserRecipeRelation):
@@ -164,3 +258,87 @@ class ShoppingCart(UserRecipeRelation):
 
     def __str__(self):
         return f'Корзина {self.user.username}: {self.recipe.name}'
+
+
+class FeedEntry(UserRecipeRelation):
+    # Лента подписок: рецепты авторов раскладываются подписчикам при
+    # публикации. Индекс ограничения (user, recipe) отдаёт ленту по
+    # убыванию id рецепта.
+    class Meta(UserRecipeRelation.Meta):
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        default_related_name = 'feed_entries'
+
+    def __str__(self):
+        return f'Лента {self.user_id}: {self.recipe_id}'
+
+
+class RecipeRanking(models.Model):
+    # Рейтинг хранится в логарифмической шкале относительно общей эпохи:
+    # затухание одинаково для всех рецептов, поэтому порядок по score
+    # совпадает с порядком по текущему рейтингу и берётся из индекса.
+    # NULL — событий ещё не было.
+    recipe = models.OneToOneField(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='ranking',
+    )
+    score = models.FloatField(
+        verbose_name='Рейтинг',
+        null=True,
+    )
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = (
+            models.Index(
+                fields=('-score', '-recipe'),
+                name='reciperanking_score_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.score}'
+
+
+class SimilarRecipe(models.Model):
+    # Top-K похожих рецептов, посчитанный командой
+    # compute_similar_recipes: индекс (recipe, -score) отдаёт список
+    # одним чтением.
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        verbose_name='Похожий рецепт',
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    score = models.FloatField(
+        verbose_name='Сходство',
+    )
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_similar_recipe',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('recipe', '-score'),
+                name='similarrecipe_score_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe_id} ~ {self.similar_id}: {self.score}'
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Upper
 from django.conf import settings
 
 
@@ -29,7 +31,24 @@ class User(AbstractUser):
         blank=True,
         default='',
     )
+    avatar_variants = models.JSONField(
+        verbose_name='Варианты аватара',
+        default=dict,
+        blank=True,
+    )
+
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Рецептов',
+        default=0,
+        editable=False,
+    )
+    subscribers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков',
+        default=0,
+        editable=False,
+    )
 
+    DERIVED_FIELDS = ('recipes_count', 'subscribers_count')
     USERNAME_FIELD = settings.USERNAME_FIELD
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name')
 
@@ -37,10 +56,33 @@ class User(AbstractUser):
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
         ordering = ('email',)
+        # Поиск в админке (icontains по search_fields) сравнивает
+        # UPPER(поле) LIKE '%...%', как и поиск рецептов и ингредиентов.
+        indexes = tuple(
+            GinIndex(
+                OpClass(Upper(field), name='gin_trgm_ops'),
+                name=f'user_{field}_trgm_idx',
+            )
+            for field in ('username', 'email', 'first_name', 'last_name')
+        )
 
     def __str__(self):
         return f'{self.username} - {self.email}'
 
+    def save(self, *args, **kwargs):
+        # Счётчики и другие вычисляемые поля меняются только update(),
+        # поэтому обычное сохранение не перезаписывает их устаревшими
+        # значениями.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.DERIVED_FIELDS
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
 
 class Sub(models.Model):
     user = models.ForeignKey(